@@ -3,6 +3,7 @@
 Simple schema validation without Django dependencies.
 Checks if all properties are in required arrays.
 """
+from collections import deque
 
 # The schema (copied directly)
 EXTRACTION_SCHEMA = {
@@ -135,6 +136,23 @@ EXTRACTION_SCHEMA = {
     }
 }
 
+def _freeze_required(schema):
+    """Convert every 'required' list in the schema to a frozenset in place."""
+    stack = [schema]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if isinstance(node.get('required'), list):
+                node['required'] = frozenset(node['required'])
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+
+
+# Freeze once at import so each validation reuses the same sets
+_freeze_required(EXTRACTION_SCHEMA)
+
+
 def validate_schema_required(schema, path=""):
     """Check if all properties are in required arrays."""
     errors = []
@@ -142,29 +160,34 @@ def validate_schema_required(schema, path=""):
     if not isinstance(schema, dict):
         return errors
 
-    if schema.get('type') == 'object' and 'properties' in schema:
-        properties = schema['properties']
-        required = schema.get('required', [])
+    # Walk nested structures with an explicit stack instead of recursion
+    stack = deque([(schema, path)])
+    while stack:
+        node, node_path = stack.pop()
+        is_object = node.get('type') == 'object'
+        required = frozenset(node.get('required', ()))
 
-        property_keys = set(properties.keys())
-        required_set = set(required)
+        # Single pass over properties: collect missing keys and children together
+        missing = []
+        children = []
+        for prop_name, prop_schema in node.get('properties', {}).items():
+            if is_object and prop_name not in required:
+                missing.append(prop_name)
+            if isinstance(prop_schema, dict):
+                new_path = f"{node_path}.{prop_name}" if node_path else prop_name
+                children.append((prop_schema, new_path))
 
-        missing = property_keys - required_set
         if missing:
             errors.append({
-                'path': path or 'root',
-                'missing': sorted(list(missing))
+                'path': node_path or 'root',
+                'missing': sorted(missing)
             })
 
-    # Recursively check nested structures
-    if 'properties' in schema:
-        for prop_name, prop_schema in schema['properties'].items():
-            new_path = f"{path}.{prop_name}" if path else prop_name
-            errors.extend(validate_schema_required(prop_schema, new_path))
+        if isinstance(node.get('items'), dict):
+            children.append((node['items'], f"{node_path}[]"))
 
-    if 'items' in schema:
-        new_path = f"{path}[]"
-        errors.extend(validate_schema_required(schema['items'], new_path))
+        # Push children in reverse so they are popped in declaration order
+        stack.extend(reversed(children))
 
     return errors
 
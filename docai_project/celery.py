@@ -0,0 +1,17 @@
+"""
+Celery application for docai_project.
+
+Used when CELERY_BROKER_URL is set; start workers with
+``celery -A docai_project worker``. Without a broker, documents are
+processed in a background thread of the web process.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'docai_project.settings')
+
+app = Celery('docai_project')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
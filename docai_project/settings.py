@@ -51,6 +51,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Compresses text responses (CSV/TXT/JSON), streamed ones included
+    'documents.middleware.TextGZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,6 +90,13 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Pages of several documents are stored from concurrent worker
+        # threads: take the write lock when a transaction begins and wait
+        # for it instead of failing with "database is locked"
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -132,6 +141,9 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # Media files (User-uploaded content)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Internal Nginx location mapped to MEDIA_ROOT; when set, original files are
+# sent by Nginx via X-Accel-Redirect instead of being read through Django
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '')
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -145,6 +157,10 @@ CORS_ALLOW_ALL_ORIGINS = True  # For development only
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 1000,  # Show up to 1000 documents (effectively all)
+    'DEFAULT_RENDERER_CLASSES': [
+        'documents.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
         'rest_framework.parsers.MultiPartParser',
@@ -155,9 +171,22 @@ REST_FRAMEWORK = {
 # AI Model Settings
 API_KEY = os.getenv('API_KEY')
 MODEL_NAME = os.getenv('MODEL_NAME')
+AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', '8'))  # Concurrent page requests
+AI_BATCH_SIZE = int(os.getenv('AI_BATCH_SIZE', '1'))  # Pages sent per AI request (1 = one request per page)
+AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', '2'))  # Retries for transient API errors
+AI_MAX_IMAGE_SIDE = int(os.getenv('AI_MAX_IMAGE_SIDE', '2048'))  # Long edge cap for page images sent to the API
 
 # Document Processing Settings
 DEFAULT_DPI = int(os.getenv('DEFAULT_DPI', '200'))
 HIGH_DPI = int(os.getenv('HIGH_DPI', '300'))
+DOCUMENT_WORKERS = int(os.getenv('DOCUMENT_WORKERS', '2'))  # Documents processed concurrently without Celery
+PAGE_WORKERS = int(os.getenv('PAGE_WORKERS', '4'))  # Pages of a PDF processed concurrently
+PAGE_JPEG_QUALITY = int(os.getenv('PAGE_JPEG_QUALITY', '85'))  # JPEG quality for stored page images
+EXPORT_CACHE_TIMEOUT = int(os.getenv('EXPORT_CACHE_TIMEOUT', '3600'))  # Seconds to reuse rendered exports
 LOW_CONFIDENCE_THRESHOLD = float(os.getenv('LOW_CONFIDENCE_THRESHOLD', '0.6'))
 MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', str(50 * 1024 * 1024)))  # 50MB default
+
+# Background Processing (Optional - Celery)
+# Without a broker, documents are processed in a thread of the web process
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # Documents are long tasks; don't hoard them
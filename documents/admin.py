@@ -27,6 +27,7 @@ class DocumentAdmin(admin.ModelAdmin):
 class PageAdmin(admin.ModelAdmin):
     list_display = ['document', 'page_number', 'detected_language', 'detected_rotation', 'page_type', 'processed']
     list_filter = ['processed', 'detected_language', 'detected_rotation', 'page_type']
+    list_select_related = ['document']
     search_fields = ['document__title']
     readonly_fields = ['width', 'height']
 
@@ -56,6 +57,7 @@ class FormFieldInline(admin.TabularInline):
 class ContentBlockAdmin(admin.ModelAdmin):
     list_display = ['page', 'block_number', 'block_type', 'confidence', 'is_handwritten', 'requires_review']
     list_filter = ['block_type', 'is_handwritten', 'requires_review']
+    list_select_related = ['page__document']
     search_fields = ['page__document__title', 'text_content']
     readonly_fields = ['bbox_x1', 'bbox_y1', 'bbox_x2', 'bbox_y2', 'confidence']
     inlines = [TableCellInline, FormFieldInline]
@@ -85,6 +87,7 @@ class ContentBlockAdmin(admin.ModelAdmin):
 class TableCellAdmin(admin.ModelAdmin):
     list_display = ['content_block', 'row_index', 'column_path', 'text', 'is_header', 'confidence']
     list_filter = ['is_header']
+    list_select_related = ['content_block__page__document']
     search_fields = ['text', 'content_block__page__document__title']
 
 
@@ -99,6 +102,7 @@ class FormFieldAdmin(admin.ModelAdmin):
 class ExtractionLogAdmin(admin.ModelAdmin):
     list_display = ['document', 'page', 'timestamp', 'success', 'processing_time', 'tokens_used', 'retry_count']
     list_filter = ['success', 'timestamp']
+    list_select_related = ['document', 'page__document']
     search_fields = ['document__title', 'error_message']
     readonly_fields = ['timestamp', 'processing_time', 'tokens_used']
 
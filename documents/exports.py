@@ -0,0 +1,233 @@
+"""
+Document exports.
+
+The txt, csv and json exports are streamed from the database a page at a
+time, and written once to files on the document when processing completes.
+"""
+import csv
+import tempfile
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+from django.core.files import File
+from django.db.models import Prefetch
+
+from .models import Document, ContentBlock
+from .serializers import PAGE_CHUNK_SIZE
+
+
+class _EchoBuffer:
+    """File-like object whose write() returns the value, for streaming csv.writer rows"""
+
+    def write(self, value):
+        return value
+
+
+def export_pages(document):
+    """Pages with the exported block columns, prefetched a chunk of pages at a time"""
+    return document.pages.prefetch_related(
+        Prefetch('content_blocks', queryset=ContentBlock.objects.only(*EXPORT_BLOCK_FIELDS))
+    ).iterator(chunk_size=PAGE_CHUNK_SIZE)
+
+
+def iter_txt_export(document):
+    """Yield the plain text export one page at a time"""
+    yield f"Document: {document.title}\n{'='*60}\n\n"
+    # Left join, so pages without blocks still get their heading
+    rows = document.pages.order_by('page_number', 'content_blocks__block_number').values_list(
+        'page_number', 'content_blocks__text_content'
+    ).iterator(chunk_size=EXPORT_ROW_CHUNK_SIZE)
+    for page_number, page_rows in groupby(rows, key=itemgetter(0)):
+        chunk = [f"Page {page_number}\n{'-'*60}\n"]
+        for _, text_content in page_rows:
+            if text_content is not None:
+                chunk.append(f"{text_content}\n\n")
+        chunk.append("\n")
+        yield ''.join(chunk)
+
+
+def iter_csv_export(document):
+    """Yield the CSV export (one row per content block) one page at a time"""
+    writer = csv.writer(_EchoBuffer())
+    yield writer.writerow(['Page', 'Block Type', 'Content'])
+    rows = ContentBlock.objects.filter(page__document=document).order_by(
+        'page__page_number', 'block_number'
+    ).values_list('page__page_number', 'block_type', 'text_content').iterator(chunk_size=EXPORT_ROW_CHUNK_SIZE)
+    for _, page_rows in groupby(rows, key=itemgetter(0)):
+        yield ''.join(map(writer.writerow, page_rows))
+
+
+def iter_json_export(document):
+    """
+    Yield the JSON export one page at a time.
+
+    Output is byte-for-byte what orjson.dumps(..., OPT_INDENT_2) produces for
+    the whole document: each page is dumped on its own and indented to its
+    depth, which is safe because JSON strings never contain raw newlines.
+    """
+    head = orjson.dumps({
+        'document': {
+            'title': document.title,
+            'status': document.status,
+            'total_pages': document.total_pages,
+        }
+    }, option=orjson.OPT_INDENT_2)
+    # Reopen the object to append the pages array
+    yield head[:-2] + b',\n  "pages": ['
+
+    empty = True
+    for page in export_pages(document):
+        page_data = {
+            'page_number': page.page_number,
+            'language': page.detected_language,
+            'page_type': page.page_type,
+            'content_blocks': [
+                {
+                    'block_number': block.block_number,
+                    'block_type': block.block_type,
+                    'text_content': block.text_content,
+                    'confidence': block.confidence,
+                    'table_data': block.table_data,
+                    'form_data': block.form_data
+                }
+                for block in page.content_blocks.all()
+            ]
+        }
+        page_json = orjson.dumps(page_data, option=orjson.OPT_INDENT_2).replace(b'\n', b'\n    ')
+        yield (b'\n    ' if empty else b',\n    ') + page_json
+        empty = False
+
+    yield b']\n}' if empty else b'\n  ]\n}'
+
+
+def iter_table_rows(cells: List[dict], empty: Optional[str] = '') -> Iterator[List[Optional[str]]]:
+    """
+    Yield the rows of a table given as {'row', 'col', 'text'} cells.
+
+    Cells are indexed and the table bounds found in a single pass; missing
+    positions come out as `empty`.
+    """
+    texts = {}
+    max_row = max_col = 0
+    for cell in cells:
+        row = cell.get('row', 0)
+        col = cell.get('col', 0)
+        texts[row, col] = cell.get('text', '')
+        if row > max_row:
+            max_row = row
+        if col > max_col:
+            max_col = col
+
+    for row in range(max_row + 1):
+        yield [texts.get((row, col), empty) for col in range(max_col + 1)]
+
+
+def iter_table_blocks(document: Document) -> Iterator[dict]:
+    """
+    Yield the document's non-empty tables in page and block order.
+
+    Only the table blocks are read, EXPORT_TABLE_CHUNK_SIZE rows at a time,
+    so a document's pages and its other blocks are never loaded.
+    """
+    rows = ContentBlock.objects.filter(
+        page__document=document, block_type='table', table_data__isnull=False
+    ).order_by('page__page_number', 'block_number').values_list(
+        'page__page_number', 'block_number', 'table_data'
+    ).iterator(chunk_size=EXPORT_TABLE_CHUNK_SIZE)
+    for page_number, block_number, table_data in rows:
+        if table_data:
+            yield {'page': page_number, 'block': block_number, 'data': table_data}
+
+
+def iter_tables_csv(table_blocks: Iterable[dict]) -> Iterator[str]:
+    """Yield the tables CSV export one table at a time"""
+    writer = csv.writer(_EchoBuffer())
+    for table_block in table_blocks:
+        yield writer.writerow([f"=== Page {table_block['page']}, Table {table_block['block']} ==="])
+        table_data = table_block['data']
+
+        if 'cells' in table_data:
+            yield ''.join(map(writer.writerow, iter_table_rows(table_data['cells'])))
+
+        yield writer.writerow([])  # Empty row between tables
+
+
+def block_table_rows(table_data: dict) -> Tuple[List[str], Iterator[List[str]]]:
+    """
+    Header texts and a generator of row texts for a block's table_data.
+
+    Block tables are stored as {'headers': [...], 'rows': [{'cells': [...]}]};
+    rows without cells are skipped. Shared by every block export format.
+    """
+    headers = [header.get('text', '') for header in table_data.get('headers') or []]
+    rows = (
+        [cell.get('text', '') for cell in row_data['cells']]
+        for row_data in table_data.get('rows') or []
+        if 'cells' in row_data
+    )
+    return headers, rows
+
+
+def iter_block_csv(block: ContentBlock) -> Iterator[str]:
+    """Yield the CSV export of a single content block"""
+    writer = csv.writer(_EchoBuffer())
+    table_data = block.table_data
+    if block.block_type == 'table' and table_data:
+        headers, rows = block_table_rows(table_data)
+        if headers:
+            rows = chain([headers], rows)
+        # One chunk for the table; map() drives writerow without a Python-level loop
+        yield ''.join(map(writer.writerow, rows))
+    elif block.text_content:
+        # For non-table blocks, just write text content
+        yield writer.writerow([block.text_content])
+
+
+# Columns read by the exports; bbox and metadata are never loaded
+EXPORT_BLOCK_FIELDS = (
+    'page', 'block_number', 'block_type', 'text_content', 'confidence', 'table_data', 'form_data'
+)
+
+# Rows fetched per round trip by the txt and csv exports
+EXPORT_ROW_CHUNK_SIZE = 2000
+
+# Table blocks fetched per round trip by the tables exports; each row
+# carries a whole table_data document
+EXPORT_TABLE_CHUNK_SIZE = 100
+
+# format -> (streaming export, content type); stored in Document.<format>_export
+TEXT_EXPORTS = {
+    'txt': (iter_txt_export, 'text/plain'),
+    'csv': (iter_csv_export, 'text/csv'),
+    'json': (iter_json_export, 'application/json'),
+}
+
+
+# Document fields holding the stored TEXT_EXPORTS files
+EXPORT_FILE_FIELDS = [f'{format_type}_export' for format_type in TEXT_EXPORTS]
+
+
+def store_exports(document: Document):
+    """
+    Write every text export of a processed document to its export file.
+
+    Results only change when the document is reprocessed, so downloads can
+    hand out these files instead of rebuilding the export per request.
+    """
+    for format_type, (export, _) in TEXT_EXPORTS.items():
+        stored = getattr(document, f'{format_type}_export')
+        stored.delete(save=False)
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in export(document):
+                tmp.write(chunk.encode() if isinstance(chunk, str) else chunk)
+            tmp.seek(0)
+            stored.save(f'{document.id}.{format_type}', File(tmp), save=False)
+    document.save(update_fields=EXPORT_FILE_FIELDS)
+
+
+def clear_exports(document: Document):
+    """Delete the stored export files; the caller saves the document"""
+    for field in EXPORT_FILE_FIELDS:
+        getattr(document, field).delete(save=False)
@@ -0,0 +1,23 @@
+"""
+HTTP middleware.
+"""
+from django.middleware.gzip import GZipMiddleware
+
+# Non-text media types that still compress well
+COMPRESSIBLE_CONTENT_TYPES = {'application/json', 'application/javascript', 'application/xml'}
+
+
+class TextGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware limited to text responses (CSV, TXT, JSON, HTML).
+
+    Page images, original uploads, PDFs and xlsx/docx files are already
+    compressed: deflating them again costs CPU for no size gain and drops
+    Content-Length, so they are passed through untouched.
+    """
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').partition(';')[0].strip().lower()
+        if content_type.startswith('text/') or content_type in COMPRESSIBLE_CONTENT_TYPES:
+            return super().process_response(request, response)
+        return response
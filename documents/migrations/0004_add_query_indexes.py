@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-15 09:12
+
+from django.db import migrations, models
+
+
+def create_trigram_index(apps, schema_editor):
+    """Trigram index for text_content searches (PostgreSQL only)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS cb_text_trgm_idx '
+        'ON documents_contentblock USING gin (text_content gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS cb_text_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_page_original_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contentblock',
+            index=models.Index(fields=['block_type'], name='cb_block_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contentblock',
+            index=models.Index(fields=['is_handwritten', 'requires_review'], name='cb_review_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='extractionlog',
+            index=models.Index(fields=['document', '-timestamp'], name='log_doc_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='page',
+            index=models.Index(fields=['document', 'processed'], name='page_doc_processed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tablecell',
+            index=models.Index(fields=['content_block', 'row_index'], name='tc_block_row_idx'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
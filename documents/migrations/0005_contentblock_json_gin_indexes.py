@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-15 09:40
+
+from django.db import migrations
+
+
+JSON_GIN_INDEXES = [
+    ('cb_tabledata_gin', 'table_data'),
+    ('cb_formdata_gin', 'form_data'),
+]
+
+
+def create_json_gin_indexes(apps, schema_editor):
+    """jsonb_path_ops indexes for containment queries on structured data (PostgreSQL only)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in JSON_GIN_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} '
+            f'ON documents_contentblock USING gin ({column} jsonb_path_ops)'
+        )
+
+
+def drop_json_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in JSON_GIN_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_add_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_json_gin_indexes, drop_json_gin_indexes),
+    ]
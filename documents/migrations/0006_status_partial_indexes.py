@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-15 22:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0005_contentblock_json_gin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['status', '-uploaded_at'], name='doc_status_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(condition=models.Q(('status__in', ['uploaded', 'processing'])), fields=['-uploaded_at'], name='doc_pending_partial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='extractionlog',
+            index=models.Index(condition=models.Q(('success', False)), fields=['document'], name='log_failed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='page',
+            index=models.Index(condition=models.Q(('processed', False)), fields=['document', 'page_number'], name='page_unprocessed_idx'),
+        ),
+    ]
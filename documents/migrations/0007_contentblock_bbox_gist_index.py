@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-15 10:25
+
+from django.db import migrations
+
+
+def create_bbox_gist_index(apps, schema_editor):
+    """GiST index over the bbox columns as a box, for overlap queries (PostgreSQL only)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS cb_bbox_gist '
+        'ON documents_contentblock USING gist '
+        '(box(point(bbox_x1, bbox_y1), point(bbox_x2, bbox_y2)))'
+    )
+
+
+def drop_bbox_gist_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS cb_bbox_gist')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_status_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_bbox_gist_index, drop_bbox_gist_index),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-15 22:47
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_vector_trigger(apps, schema_editor):
+    """Keep search_vector in sync with text_content and GIN-index it (PostgreSQL only)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # A trigger rather than a post_save signal: blocks are written with bulk_create
+    schema_editor.execute(
+        'CREATE TRIGGER cb_search_vector_update '
+        'BEFORE INSERT OR UPDATE OF text_content ON documents_contentblock '
+        'FOR EACH ROW EXECUTE PROCEDURE '
+        "tsvector_update_trigger(search_vector, 'pg_catalog.english', text_content)"
+    )
+    schema_editor.execute(
+        "UPDATE documents_contentblock "
+        "SET search_vector = to_tsvector('pg_catalog.english', coalesce(text_content, ''))"
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS cb_search_vector_gin '
+        'ON documents_contentblock USING gin (search_vector)'
+    )
+
+
+def drop_search_vector_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS cb_search_vector_gin')
+    schema_editor.execute('DROP TRIGGER IF EXISTS cb_search_vector_update ON documents_contentblock')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_contentblock_bbox_gist_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentblock',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_vector_trigger, drop_search_vector_trigger),
+    ]
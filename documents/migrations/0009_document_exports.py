@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-15 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0008_contentblock_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='csv_export',
+            field=models.FileField(blank=True, null=True, upload_to='exports/%Y/%m/%d/'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='json_export',
+            field=models.FileField(blank=True, null=True, upload_to='exports/%Y/%m/%d/'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='txt_export',
+            field=models.FileField(blank=True, null=True, upload_to='exports/%Y/%m/%d/'),
+        ),
+    ]
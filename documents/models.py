@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.search import SearchVectorField
 import json
 
 
@@ -37,8 +38,22 @@ class Document(models.Model):
     # Processing info
     processing_time = models.FloatField(blank=True, null=True)  # in seconds
 
+    # Exports written when processing completes (see documents/exports.py)
+    txt_export = models.FileField(upload_to='exports/%Y/%m/%d/', blank=True, null=True)
+    csv_export = models.FileField(upload_to='exports/%Y/%m/%d/', blank=True, null=True)
+    json_export = models.FileField(upload_to='exports/%Y/%m/%d/', blank=True, null=True)
+
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['status', '-uploaded_at'], name='doc_status_uploaded_idx'),
+            # Small partial index over the documents still in the work queue
+            models.Index(
+                fields=['-uploaded_at'],
+                condition=models.Q(status__in=['uploaded', 'processing']),
+                name='doc_pending_partial_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.original_filename})"
@@ -80,6 +95,14 @@ class Page(models.Model):
     class Meta:
         ordering = ['document', 'page_number']
         unique_together = ['document', 'page_number']
+        indexes = [
+            models.Index(fields=['document', 'processed'], name='page_doc_processed_idx'),
+            models.Index(
+                fields=['document', 'page_number'],
+                condition=models.Q(processed=False),
+                name='page_unprocessed_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.document.title} - Page {self.page_number}"
@@ -124,9 +147,17 @@ class ContentBlock(models.Model):
     form_data = models.JSONField(default=dict, blank=True)   # Always present, empty dict if not a form
     metadata = models.JSONField(default=dict, blank=True)
 
+    # Full-text search (PostgreSQL only): filled from text_content by a
+    # database trigger and GIN-indexed, see migration 0008
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
+
     class Meta:
         ordering = ['page', 'block_number']
         unique_together = ['page', 'block_number']
+        indexes = [
+            models.Index(fields=['block_type'], name='cb_block_type_idx'),
+            models.Index(fields=['is_handwritten', 'requires_review'], name='cb_review_idx'),
+        ]
 
     def __str__(self):
         return f"{self.page} - Block {self.block_number} ({self.block_type})"
@@ -157,6 +188,9 @@ class TableCell(models.Model):
 
     class Meta:
         ordering = ['content_block', 'row_index', 'column_path']
+        indexes = [
+            models.Index(fields=['content_block', 'row_index'], name='tc_block_row_idx'),
+        ]
 
     def __str__(self):
         return f"Cell ({self.row_index}, {self.column_path})"
@@ -223,6 +257,14 @@ class ExtractionLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['document', '-timestamp'], name='log_doc_timestamp_idx'),
+            models.Index(
+                fields=['document'],
+                condition=models.Q(success=False),
+                name='log_failed_idx',
+            ),
+        ]
 
     def __str__(self):
         status = "Success" if self.success else "Failed"
@@ -0,0 +1,31 @@
+"""
+API renderers.
+"""
+import orjson
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson.
+
+    Types orjson does not know natively (lazy translation strings, Decimal,
+    QuerySets, ...) and datetimes, whose format differs, go through DRF's
+    encoder. orjson only pretty prints with two spaces, so any requested
+    indent renders that way.
+    """
+    _default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+
+        ret = orjson.dumps(data, default=self._default, option=option)
+
+        # Keep the output a strict JavaScript subset, as JSONRenderer does
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -1,9 +1,23 @@
 """
 REST API Serializers for document models.
 """
+import os
+from collections import defaultdict
+import orjson
 from rest_framework import serializers
 from .models import Document, Page, ContentBlock, TableCell, FormField, ExtractionLog
 
+# Uploaded file extension -> Document.file_type (anything else is treated as an image)
+EXTENSION_FILE_TYPES = {
+    '.pdf': 'pdf',
+    '.jpg': 'image',
+    '.jpeg': 'image',
+    '.png': 'image',
+    '.tiff': 'image',
+    '.tif': 'image',
+    '.bmp': 'image',
+}
+
 
 class TableCellSerializer(serializers.ModelSerializer):
     """Serializer for table cells"""
@@ -69,9 +83,67 @@ class PageListSerializer(serializers.ModelSerializer):
         ]
 
 
+# Pages whose nested content is fetched per round of queries
+PAGE_CHUNK_SIZE = 50
+
+
+def iter_page_payloads(document, request=None, chunk_size=PAGE_CHUNK_SIZE):
+    """
+    Yield each page of a document serialized with its nested content.
+
+    Nesting PageSerializer -> ContentBlockSerializer -> cell/field
+    serializers issues a query per page and per block and runs DRF field
+    machinery for every row. Instead each level is fetched with .values()
+    for a chunk of pages at a time and grouped under its parent in a single
+    pass, so memory is bounded by the chunk. Output matches the nested
+    serializers.
+    """
+    image_storage = Page._meta.get_field('image').storage
+    cell_fields = TableCellSerializer.Meta.fields
+    field_fields = FormFieldSerializer.Meta.fields
+    block_fields = [f for f in ContentBlockSerializer.Meta.fields if f not in ('table_cells', 'form_fields')]
+    page_fields = [f for f in PageSerializer.Meta.fields if f != 'content_blocks']
+
+    pages = list(Page.objects.filter(document=document).values(*page_fields))
+
+    for start in range(0, len(pages), chunk_size):
+        chunk = pages[start:start + chunk_size]
+        page_ids = [page['id'] for page in chunk]
+
+        cells_by_block = defaultdict(list)
+        for cell in TableCell.objects.filter(
+            content_block__page_id__in=page_ids
+        ).values('content_block_id', *cell_fields):
+            cells_by_block[cell.pop('content_block_id')].append(cell)
+
+        fields_by_block = defaultdict(list)
+        for field in FormField.objects.filter(
+            content_block__page_id__in=page_ids
+        ).values('content_block_id', *field_fields):
+            fields_by_block[field.pop('content_block_id')].append(field)
+
+        blocks_by_page = defaultdict(list)
+        for block in ContentBlock.objects.filter(
+            page_id__in=page_ids
+        ).values('page_id', *block_fields):
+            block['table_cells'] = cells_by_block.get(block['id'], [])
+            block['form_fields'] = fields_by_block.get(block['id'], [])
+            blocks_by_page[block.pop('page_id')].append(block)
+
+        for page in chunk:
+            # Match DRF's ImageField output: absolute URL or None
+            if page['image']:
+                url = image_storage.url(page['image'])
+                page['image'] = request.build_absolute_uri(url) if request else url
+            else:
+                page['image'] = None
+            page['content_blocks'] = blocks_by_page.get(page['id'], [])
+            yield page
+
+
 class DocumentSerializer(serializers.ModelSerializer):
     """Full serializer for documents with all pages and content"""
-    pages = PageSerializer(many=True, read_only=True)
+    pages = serializers.SerializerMethodField()
 
     class Meta:
         model = Document
@@ -83,6 +155,32 @@ class DocumentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['uploaded_at', 'processed_at', 'processing_time', 'status']
 
+    def get_pages(self, instance):
+        """Nested pages payload, built from flat per-level queries"""
+        if not self.context.get('include_pages', True):
+            return []
+        return list(iter_page_payloads(instance, self.context.get('request')))
+
+
+def stream_document(document, request=None):
+    """
+    Yield the DocumentSerializer payload as JSON bytes, one page at a time.
+
+    Peak memory is bounded by one chunk of pages instead of the whole
+    document, which matters for large documents with dense tables.
+    """
+    head = DocumentSerializer(
+        document, context={'request': request, 'include_pages': False}
+    ).data
+    head = dict(head)
+    head.pop('pages', None)
+
+    # Reopen the object to append the pages array
+    yield orjson.dumps(head)[:-1] + b',"pages":['
+    for index, page in enumerate(iter_page_payloads(document, request)):
+        yield (b',' if index else b'') + orjson.dumps(page)
+    yield b']}'
+
 
 class DocumentListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for document lists (without pages)"""
@@ -96,22 +194,21 @@ class DocumentListSerializer(serializers.ModelSerializer):
 
 
 class DocumentUploadSerializer(serializers.ModelSerializer):
-    """Serializer for document upload"""
+    """Serializer for document upload; responds with the document list representation"""
 
     class Meta:
         model = Document
-        fields = ['title', 'file']
+        fields = DocumentListSerializer.Meta.fields + ['file']
+        read_only_fields = [f for f in DocumentListSerializer.Meta.fields if f != 'title']
+        extra_kwargs = {'file': {'write_only': True}}
 
     def create(self, validated_data):
         """Create document and determine file type"""
         uploaded_file = validated_data['file']
 
         # Determine file type
-        file_type = 'image'
-        if uploaded_file.name.lower().endswith('.pdf'):
-            file_type = 'pdf'
-        elif uploaded_file.name.lower().endswith(('.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp')):
-            file_type = 'image'
+        extension = os.path.splitext(uploaded_file.name)[1].lower()
+        file_type = EXTENSION_FILE_TYPES.get(extension, 'image')
 
         # Create document
         document = Document.objects.create(
@@ -137,16 +234,3 @@ class ExtractionLogSerializer(serializers.ModelSerializer):
             'success', 'error_message',
             'processing_time', 'tokens_used', 'retry_count'
         ]
-
-
-class SearchResultSerializer(serializers.Serializer):
-    """Serializer for search results"""
-    document_id = serializers.IntegerField()
-    document_title = serializers.CharField()
-    page_id = serializers.IntegerField()
-    page_number = serializers.IntegerField()
-    block_id = serializers.IntegerField()
-    block_type = serializers.CharField()
-    text_content = serializers.CharField()
-    confidence = serializers.FloatField()
-    relevance_score = serializers.FloatField(required=False)
@@ -1,7 +1,7 @@
 # Import cancellation_manager FIRST to avoid circular import issues
 from .cancellation_manager import cancellation_manager
 from .rotation_detector import RotationDetector
-from .ai_extractor import AIExtractor
-from .document_processor import DocumentProcessor
+from .ai_extractor import AIExtractor, VALIDATE_EXTRACTION, SCHEMA_VERSION
+from .document_processor import DocumentProcessor, get_document_processor
 
-__all__ = ['cancellation_manager', 'RotationDetector', 'AIExtractor', 'DocumentProcessor']
+__all__ = ['cancellation_manager', 'RotationDetector', 'AIExtractor', 'VALIDATE_EXTRACTION', 'SCHEMA_VERSION', 'DocumentProcessor', 'get_document_processor']
@@ -2,21 +2,174 @@
 AI-based document content extraction service.
 Uses advanced language models with structured output (json_schema) to extract content from documents.
 """
+import asyncio
 import base64
+import functools
+import hashlib
 import io
+import json
+import os
+import threading
 import time
 import logging
-from typing import Dict, Any, List, Optional
-from PIL import Image
-from openai import OpenAI
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Literal, Tuple, TypedDict
+import fastjsonschema
+import msgspec
+from PIL import Image, ImageStat
+from openai import OpenAI, AsyncOpenAI
 from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
+# Image preparation is CPU bound and Pillow releases the GIL while it runs,
+# so async extraction hands it to a pool sized to the cores instead of
+# blocking the event loop
+_ENCODE_POOL = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix='page-encode')
+
+# Event loop that runs async extraction for synchronous callers, started on
+# first use. async_to_sync builds a new loop per call, and an AsyncOpenAI
+# connection pool cannot outlive its loop, so every batch would open fresh
+# TCP and TLS connections; a single long-lived loop keeps them warm.
+_LOOP_LOCK = threading.Lock()
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+# Typed mirror of EXTRACTION_SCHEMA, decoded and validated by msgspec in C.
+# TypedDicts decode to plain dicts, so downstream code is unchanged.
+class BBox(TypedDict):
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+
+
+class TableHeader(TypedDict):
+    text: str
+    column_path: List[int]
+    level: int
+
+
+class TableCellData(TypedDict):
+    text: str
+    column_path: List[int]
+    rowspan: int
+    colspan: int
+
+
+class TableRow(TypedDict):
+    row_index: int
+    cells: List[TableCellData]
+
+
+class TableData(TypedDict):
+    headers: List[TableHeader]
+    rows: List[TableRow]
+
+
+class FormFieldData(TypedDict):
+    field_name: str
+    field_label: str
+    field_type: Literal["text", "checkbox", "radio", "select", "date", "signature", "other"]
+    field_value: str
+    is_filled: bool
+
+
+class FormData(TypedDict):
+    fields: List[FormFieldData]
+
+
+class ContentBlockData(TypedDict):
+    block_number: int
+    block_type: Literal["paragraph", "heading", "table", "form", "list", "handwriting", "image", "signature", "other"]
+    text_content: str
+    bbox: BBox
+    confidence: float
+    is_handwritten: bool
+    table_data: TableData
+    form_data: FormData
+
+
+class PageExtraction(TypedDict):
+    page_type: str
+    detected_language: Literal["en", "bn", "bn+en", "unknown"]
+    language_confidence: float
+    content_blocks: List[ContentBlockData]
+
+
+class MultiPageExtraction(TypedDict):
+    pages: List[PageExtraction]
+
+
+EXTRACTION_DECODER = msgspec.json.Decoder(PageExtraction)
+MULTI_PAGE_DECODER = msgspec.json.Decoder(MultiPageExtraction)
+
+EXTRACTION_PROMPT = """You are an advanced document analysis system. Extract ALL content from this document page with maximum accuracy.
+
+**Instructions:**
+1. **Detect page type**: Identify if this is a form, table, mixed content, invoice, text document, etc.
+2. **Detect language**: Identify if the text is in English (en), Bangla (bn), mixed (bn+en), or unknown.
+3. **Extract all content blocks** in reading order:
+   - Paragraphs, headings, lists, tables, forms, handwriting, images, signatures
+   - For each block, provide:
+     - Accurate text transcription (preserve exact text including Bangla characters)
+     - Block type classification
+     - Bounding box coordinates (normalized 0-1 relative to page dimensions)
+     - Confidence score (0-1)
+     - Whether it's handwritten
+
+4. **For TABLES** (even if block is not a table, always include empty table_data):
+   - Extract complete table structure with nested columns (headers at multiple levels)
+   - Use column_path to represent hierarchy: [0] for top-level, [0,1] for sub-column, [0,1,2] for sub-sub-column
+   - Capture all rows and cells with exact text
+   - Note any merged cells (rowspan/colspan)
+
+5. **For FORMS** (even if block is not a form, always include empty form_data):
+   - Extract all form fields with labels
+   - Identify field types (text, checkbox, radio, select, date, signature)
+   - Capture current values if filled
+   - Note which fields are filled vs empty
+
+6. **Bounding boxes**: Provide normalized coordinates (0-1) where:
+   - x1, y1 = top-left corner
+   - x2, y2 = bottom-right corner
+
+7. **IMPORTANT**: Every block MUST have both table_data and form_data fields:
+   - If not a table: table_data = {"headers": [], "rows": []}
+   - If not a form: form_data = {"fields": []}
+
+8. **Language confidence**: Provide a score (0-1) indicating confidence in language detection.
+
+Extract everything accurately, preserving the exact structure and content of the document."""
+
+MULTI_PAGE_PROMPT = EXTRACTION_PROMPT + """
+
+The images are consecutive pages of one document. Return one entry in "pages" for each image, in the order the images are given."""
+
 
 class AIExtractor:
     """Extracts document content using AI API with structured output"""
 
+    # Smallest long edge tried when the API rejects an image as too large
+    MIN_IMAGE_SIDE = 512
+
+    # A page is blank, and not sent to the API at all, when fewer than this
+    # fraction of its pixels differ from the background by over INK_CONTRAST
+    # grey levels. Scanner noise stays well inside the contrast band, while a
+    # single printed line is far above the fraction.
+    BLANK_INK_RATIO = 0.00001
+    INK_CONTRAST = 64
+
+    # Grayscale standard deviation below which a page counts as sparse
+    # (cover sheets, near-empty forms) and is sent at "low" detail
+    LOW_DETAIL_STDDEV = 20.0
+
+    # Extra attempts when a response does not decode against the schema
+    VALIDATION_RETRIES = 2
+
     # JSON Schema for structured output
     EXTRACTION_SCHEMA = {
         "name": "document_extraction",
@@ -158,12 +311,14 @@ class AIExtractor:
         """
         self.api_key = api_key or settings.API_KEY
         self.model = model or settings.MODEL_NAME
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = get_shared_client(self.api_key)
 
     def extract_page_content(
         self,
         image: Image.Image,
-        retry_count: int = 0
+        retry_count: int = 0,
+        detail: Optional[Literal["low", "high"]] = None,
+        n_samples: int = 1
     ) -> Dict[str, Any]:
         """
         Extract content from a single page image.
@@ -171,160 +326,727 @@ class AIExtractor:
         Args:
             image: PIL Image of the page
             retry_count: Current retry attempt
+            detail: Image detail level (chosen from the page content if omitted)
+            n_samples: Candidate extractions to request in one call; with more
+                than one, "data" is their consensus and "samples" holds them all
 
         Returns:
             dict: Extracted content with structure matching the schema
         """
         start_time = time.time()
 
+        max_side = settings.AI_MAX_IMAGE_SIDE
+
+        # Blank separator and back-of-form pages need no model call
+        histogram = self._page_histogram(image)
+        if self._is_blank(histogram):
+            return self._blank_result(start_time, retry_count)
+        detail = detail or self._choose_detail(image, retry_count, histogram)
+
         try:
-            # Convert image to base64
-            image_base64 = self._image_to_base64(image)
-
-            # Create the prompt
-            prompt = self._create_extraction_prompt()
-
-            # Call AI API
-            logger.info(f"Calling AI API with model {self.model}")
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_base64}",
-                                    "detail": "high"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                response_format={
-                    "type": "json_schema",
-                    "json_schema": self.EXTRACTION_SCHEMA
-                },
-                temperature=0.1,
-            )
+            while True:
+                image_bytes = self._image_to_jpeg(image, max_side)
 
-            processing_time = time.time() - start_time
+                # Reuse a previous extraction of the identical page
+                cache_key = self._cache_key(image_bytes, detail, n_samples)
+                cached = self._result_from_cache(cache.get(cache_key), start_time, retry_count, n_samples)
+                if cached:
+                    return cached
 
-            # Extract the content
-            content = response.choices[0].message.content
-            import json
-            result = json.loads(content)
+                request = self._build_request(image_bytes, detail, n_samples)
 
-            logger.info(f"Extraction completed in {processing_time:.2f}s")
-            logger.info(f"Tokens used: {response.usage.total_tokens}")
+                # Call AI API
+                logger.info("Calling AI API with model %s", self.model)
+                try:
+                    result = self._complete(request, start_time, retry_count)
+                    break
+                except Exception as e:
+                    if not self._image_too_large(e, max_side):
+                        raise
+                    max_side //= 2
+                    logger.warning("Image rejected as too large, retrying at %dpx", max_side)
 
-            return {
-                "success": True,
-                "data": result,
-                "processing_time": processing_time,
-                "tokens_used": response.usage.total_tokens,
-                "retry_count": retry_count
-            }
+            if result['success']:
+                cache.set(cache_key, self._cache_entry(result), timeout=None)
+            return result
 
         except Exception as e:
-            processing_time = time.time() - start_time
-            logger.error(f"Extraction failed: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e),
-                "processing_time": processing_time,
-                "tokens_used": 0,
-                "retry_count": retry_count
-            }
+            return self._build_error(e, start_time, retry_count)
 
-    def _image_to_base64(self, image: Image.Image) -> str:
-        """Convert PIL Image to base64 string"""
-        # Convert to RGB if needed
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+    async def extract_page_content_async(
+        self,
+        image: Image.Image,
+        retry_count: int = 0,
+        client: Optional[AsyncOpenAI] = None,
+        detail: Optional[Literal["low", "high"]] = None,
+        n_samples: int = 1
+    ) -> Dict[str, Any]:
+        """
+        Async variant of extract_page_content.
 
-        # Save to bytes
-        buffer = io.BytesIO()
-        image.save(buffer, format='JPEG', quality=95)
-        buffer.seek(0)
+        Args:
+            image: PIL Image of the page
+            retry_count: Current retry attempt
+            client: AsyncOpenAI client to reuse (a short-lived one is created if omitted)
+            detail: Image detail level (chosen from the page content if omitted)
+            n_samples: Candidate extractions to request in one call
 
-        # Encode to base64
-        return base64.b64encode(buffer.read()).decode('utf-8')
+        Returns:
+            dict: Extracted content with structure matching the schema
+        """
+        if client is None:
+            async with AsyncOpenAI(api_key=self.api_key, max_retries=settings.AI_MAX_RETRIES) as client:
+                return await self.extract_page_content_async(image, retry_count, client, detail, n_samples)
 
-    def _create_extraction_prompt(self) -> str:
-        """Create the extraction prompt for AI model"""
-        return """You are an advanced document analysis system. Extract ALL content from this document page with maximum accuracy.
+        start_time = time.time()
+        loop = asyncio.get_running_loop()
 
-**Instructions:**
-1. **Detect page type**: Identify if this is a form, table, mixed content, invoice, text document, etc.
-2. **Detect language**: Identify if the text is in English (en), Bangla (bn), mixed (bn+en), or unknown.
-3. **Extract all content blocks** in reading order:
-   - Paragraphs, headings, lists, tables, forms, handwriting, images, signatures
-   - For each block, provide:
-     - Accurate text transcription (preserve exact text including Bangla characters)
-     - Block type classification
-     - Bounding box coordinates (normalized 0-1 relative to page dimensions)
-     - Confidence score (0-1)
-     - Whether it's handwritten
+        max_side = settings.AI_MAX_IMAGE_SIDE
 
-4. **For TABLES** (even if block is not a table, always include empty table_data):
-   - Extract complete table structure with nested columns (headers at multiple levels)
-   - Use column_path to represent hierarchy: [0] for top-level, [0,1] for sub-column, [0,1,2] for sub-sub-column
-   - Capture all rows and cells with exact text
-   - Note any merged cells (rowspan/colspan)
+        # Blank separator and back-of-form pages need no model call
+        histogram = await loop.run_in_executor(_ENCODE_POOL, self._page_histogram, image)
+        if self._is_blank(histogram):
+            return self._blank_result(start_time, retry_count)
+        detail = detail or self._choose_detail(image, retry_count, histogram)
 
-5. **For FORMS** (even if block is not a form, always include empty form_data):
-   - Extract all form fields with labels
-   - Identify field types (text, checkbox, radio, select, date, signature)
-   - Capture current values if filled
-   - Note which fields are filled vs empty
+        try:
+            while True:
+                image_bytes = await loop.run_in_executor(_ENCODE_POOL, self._image_to_jpeg, image, max_side)
 
-6. **Bounding boxes**: Provide normalized coordinates (0-1) where:
-   - x1, y1 = top-left corner
-   - x2, y2 = bottom-right corner
+                # Reuse a previous extraction of the identical page
+                cache_key = self._cache_key(image_bytes, detail, n_samples)
+                cached = self._result_from_cache(await cache.aget(cache_key), start_time, retry_count, n_samples)
+                if cached:
+                    return cached
 
-7. **IMPORTANT**: Every block MUST have both table_data and form_data fields:
-   - If not a table: table_data = {"headers": [], "rows": []}
-   - If not a form: form_data = {"fields": []}
+                request = self._build_request(image_bytes, detail, n_samples)
 
-8. **Language confidence**: Provide a score (0-1) indicating confidence in language detection.
+                logger.info("Calling AI API with model %s (async)", self.model)
+                try:
+                    result = await self._complete_async(client, request, start_time, retry_count)
+                    break
+                except Exception as e:
+                    if not self._image_too_large(e, max_side):
+                        raise
+                    max_side //= 2
+                    logger.warning("Image rejected as too large, retrying at %dpx", max_side)
 
-Extract everything accurately, preserving the exact structure and content of the document."""
+            if result['success']:
+                await cache.aset(cache_key, self._cache_entry(result), timeout=None)
+            return result
+
+        except Exception as e:
+            return self._build_error(e, start_time, retry_count)
+
+    async def extract_pages(
+        self,
+        images: List[Image.Image],
+        max_concurrency: Optional[int] = None,
+        client: Optional[AsyncOpenAI] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract content from several pages concurrently.
+
+        Requests are I/O bound, so wall time approaches the slowest single
+        page instead of the sum over all pages.
+
+        Args:
+            images: PIL Images of the pages, in page order
+            max_concurrency: Maximum in-flight requests (defaults to settings)
+            client: AsyncOpenAI client to reuse (a short-lived one is created if omitted)
 
-    def validate_extraction(self, result: Dict[str, Any]) -> bool:
+        Returns:
+            list: One extraction result per image, in the same order
+        """
+        if client is None:
+            # One client per batch: its connection pool is bound to this event loop
+            async with AsyncOpenAI(api_key=self.api_key, max_retries=settings.AI_MAX_RETRIES) as client:
+                return await self.extract_pages(images, max_concurrency, client)
+
+        semaphore = asyncio.Semaphore(max_concurrency or settings.AI_MAX_CONCURRENCY)
+
+        async def bounded(image):
+            async with semaphore:
+                return await self.extract_page_content_async(image, client=client)
+
+        return await asyncio.gather(*(bounded(image) for image in images))
+
+    def extract_pages_sync(
+        self,
+        images: List[Image.Image],
+        max_concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Blocking wrapper around extract_pages for synchronous callers"""
+        return run_in_background_loop(
+            self.extract_pages(images, max_concurrency, get_shared_async_client(self.api_key))
+        )
+
+    async def extract_multiple_pages(
+        self,
+        images: List[Image.Image],
+        max_per_call: int = 4,
+        max_concurrency: Optional[int] = None,
+        client: Optional[AsyncOpenAI] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Validate that the extraction result meets quality standards.
+        Extract content sending up to max_per_call pages in each request.
+
+        The prompt and schema are billed once per request instead of once per
+        page, which suits short documents. Groups run concurrently; a group
+        whose response does not cover every page falls back to per-page
+        requests. Blank and cached pages are resolved without a request, as
+        in extract_page_content.
 
         Args:
-            result: Extraction result dictionary
+            images: PIL Images of the pages, in page order
+            max_per_call: Maximum pages per request
+            max_concurrency: Maximum in-flight requests (defaults to settings)
+            client: AsyncOpenAI client to reuse (a short-lived one is created if omitted)
 
         Returns:
-            bool: True if valid, False otherwise
+            list: One extraction result per image, in the same order
         """
-        if not result.get('success'):
-            return False
+        if client is None:
+            async with AsyncOpenAI(api_key=self.api_key, max_retries=settings.AI_MAX_RETRIES) as client:
+                return await self.extract_multiple_pages(images, max_per_call, max_concurrency, client)
+
+        groups = [images[i:i + max_per_call] for i in range(0, len(images), max_per_call)]
+        semaphore = asyncio.Semaphore(max_concurrency or settings.AI_MAX_CONCURRENCY)
+
+        async def bounded(group):
+            async with semaphore:
+                return await self._extract_group_async(group, client)
+
+        grouped = await asyncio.gather(*(bounded(group) for group in groups))
 
-        data = result.get('data', {})
+        return [result for group in grouped for result in group]
 
-        # Check required fields
-        if not all(key in data for key in ['page_type', 'detected_language', 'content_blocks']):
-            logger.warning("Missing required fields in extraction result")
-            return False
+    def extract_multiple_pages_sync(
+        self,
+        images: List[Image.Image],
+        max_per_call: int = 4,
+        max_concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Blocking wrapper around extract_multiple_pages for synchronous callers"""
+        return run_in_background_loop(
+            self.extract_multiple_pages(
+                images, max_per_call, max_concurrency, get_shared_async_client(self.api_key)
+            )
+        )
+
+    async def _extract_group_async(
+        self,
+        images: List[Image.Image],
+        client: AsyncOpenAI
+    ) -> List[Dict[str, Any]]:
+        """Extract a group of pages with a single request"""
+        if len(images) == 1:
+            return [await self.extract_page_content_async(images[0], client=client)]
 
-        # Check if we have content
-        if not data['content_blocks']:
-            logger.warning("No content blocks extracted")
-            return False
+        start_time = time.time()
+        loop = asyncio.get_running_loop()
+
+        # Blank pages and pages extracted before are answered without the model
+        encoded = await asyncio.gather(
+            *(loop.run_in_executor(_ENCODE_POOL, self._encode_group_page, image) for image in images)
+        )
+        results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+        pending = []
+        for index, page in enumerate(encoded):
+            if page is None:
+                results[index] = self._blank_result(start_time, 0)
+                continue
+            image_bytes, detail = page
+            cache_key = self._cache_key(image_bytes, detail)
+            results[index] = self._result_from_cache(await cache.aget(cache_key), start_time, 0)
+            if results[index] is None:
+                pending.append((index, image_bytes, detail, cache_key))
+
+        if len(pending) < 2:
+            for index, *_ in pending:
+                results[index] = await self.extract_page_content_async(images[index], client=client)
+            return results
+
+        try:
+            request = self._build_multi_page_request(
+                [(image_bytes, detail) for _, image_bytes, detail, _ in pending]
+            )
+
+            logger.info("Calling AI API with model %s for %d pages (async)", self.model, len(pending))
+            response = await client.chat.completions.create(**request)
+
+            pages = MULTI_PAGE_DECODER.decode(response.choices[0].message.content)['pages']
+            if len(pages) != len(pending):
+                raise ValueError(f"Expected {len(pending)} pages, got {len(pages)}")
+
+        except Exception as e:
+            logger.warning("Multi-page extraction failed, extracting pages individually: %s", e)
+            extracted = await asyncio.gather(
+                *(self.extract_page_content_async(images[index], client=client) for index, *_ in pending)
+            )
+            for (index, *_), result in zip(pending, extracted):
+                results[index] = result
+            return results
+
+        processing_time = time.time() - start_time
+        logger.info("Extraction of %d pages completed in %.2fs", len(pages), processing_time)
+        logger.info("Tokens used: %d", response.usage.total_tokens)
+
+        # Tokens are reported per request; attribute an equal share to each page
+        tokens_per_page = response.usage.total_tokens // len(pages)
+        for (index, _, _, cache_key), page in zip(pending, pages):
+            results[index] = {
+                "success": True,
+                "data": page,
+                "processing_time": processing_time,
+                "tokens_used": tokens_per_page,
+                "retry_count": 0
+            }
+            await cache.aset(cache_key, self._cache_entry(results[index]), timeout=None)
+        return results
 
-        # Check each block has required structure
-        for block in data['content_blocks']:
-            if not all(key in block for key in ['block_type', 'table_data', 'form_data']):
-                logger.warning(f"Block {block.get('block_number')} missing required fields")
-                return False
+    def _build_request(self, image_bytes: bytes, detail: str = "high", n_samples: int = 1) -> Dict[str, Any]:
+        """Build the chat completion request for JPEG-encoded page bytes"""
+        # Encode to a base64 data URL
+        image_url = self._jpeg_data_url(image_bytes)
 
-        return True
+        request = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": EXTRACTION_PROMPT
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": image_url,
+                                "detail": detail
+                            }
+                        }
+                    ]
+                }
+            ],
+            "response_format": RESPONSE_FORMAT,
+            "temperature": 0.1,
+        }
+        if n_samples > 1:
+            # Input tokens are billed once however many candidates come back
+            request["n"] = n_samples
+        return request
+
+    def _build_multi_page_request(self, pages: List[Tuple[bytes, str]]) -> Dict[str, Any]:
+        """Build one chat completion request covering several (JPEG bytes, detail) pages"""
+        content = [{"type": "text", "text": MULTI_PAGE_PROMPT}]
+        for image_bytes, detail in pages:
+            content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": self._jpeg_data_url(image_bytes),
+                    "detail": detail
+                }
+            })
+
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": content}],
+            "response_format": MULTI_PAGE_RESPONSE_FORMAT,
+            "temperature": 0.1,
+        }
+
+    def _complete(self, request: Dict[str, Any], start_time: float, retry_count: int) -> Dict[str, Any]:
+        """Call the API, sending schema errors back to the model for a corrected answer"""
+        for attempt in range(self.VALIDATION_RETRIES + 1):
+            response = self.client.chat.completions.create(**request)
+            try:
+                return self._build_result(response, start_time, retry_count)
+            except msgspec.DecodeError as e:
+                if attempt == self.VALIDATION_RETRIES:
+                    raise
+                logger.warning("Extraction did not match schema, retrying with feedback: %s", e)
+                request = self._with_feedback(request, response, e)
+                time.sleep(1.0 * (attempt + 1))
+
+    async def _complete_async(
+        self,
+        client: AsyncOpenAI,
+        request: Dict[str, Any],
+        start_time: float,
+        retry_count: int
+    ) -> Dict[str, Any]:
+        """Async variant of _complete"""
+        for attempt in range(self.VALIDATION_RETRIES + 1):
+            response = await client.chat.completions.create(**request)
+            try:
+                return self._build_result(response, start_time, retry_count)
+            except msgspec.DecodeError as e:
+                if attempt == self.VALIDATION_RETRIES:
+                    raise
+                logger.warning("Extraction did not match schema, retrying with feedback: %s", e)
+                request = self._with_feedback(request, response, e)
+                await asyncio.sleep(1.0 * (attempt + 1))
+
+    def _with_feedback(self, request: Dict[str, Any], response, error: Exception) -> Dict[str, Any]:
+        """Extend the conversation with the rejected answer and the decode error"""
+        return {
+            **request,
+            "messages": [
+                *request["messages"],
+                {"role": "assistant", "content": response.choices[0].message.content},
+                {"role": "user", "content": f"Your output had error: {error}. Fix and retry."}
+            ]
+        }
+
+    def _build_result(self, response, start_time: float, retry_count: int) -> Dict[str, Any]:
+        """Decode an API response into an extraction result"""
+        processing_time = time.time() - start_time
+
+        # Extract the content
+        samples = [EXTRACTION_DECODER.decode(choice.message.content) for choice in response.choices]
+
+        logger.info("Extraction completed in %.2fs", processing_time)
+        logger.info("Tokens used: %d", response.usage.total_tokens)
+
+        result = {
+            "success": True,
+            "data": samples[0] if len(samples) == 1 else aggregate_samples(samples),
+            "processing_time": processing_time,
+            "tokens_used": response.usage.total_tokens,
+            "retry_count": retry_count
+        }
+        if len(samples) > 1:
+            result["samples"] = samples
+        return result
+
+    def _cache_key(self, image_bytes: bytes, detail: str = "high", n_samples: int = 1) -> str:
+        """
+        Content address of an extraction request.
+
+        Hashes model, schema version, prompt, detail level, sample count and
+        the exact JPEG bytes sent, each length-prefixed so field boundaries
+        cannot collide.
+        """
+        digest = hashlib.sha256()
+        for field in (
+            (self.model or '').encode('utf-8'),
+            SCHEMA_VERSION.encode('utf-8'),
+            _PROMPT_BYTES,
+            detail.encode('ascii'),
+            str(n_samples).encode('ascii'),
+            image_bytes,
+        ):
+            digest.update(len(field).to_bytes(8, 'big'))
+            digest.update(field)
+        return f"extraction:{digest.hexdigest()}"
+
+    def _cache_entry(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Cache payload for a successful result, with an audit sidecar"""
+        entry = {
+            "data": result["data"],
+            "model": self.model,
+            "schema_version": SCHEMA_VERSION,
+            "cached_at": timezone.now().isoformat(),
+        }
+        if "samples" in result:
+            entry["samples"] = result["samples"]
+        return entry
+
+    def _result_from_cache(
+        self,
+        entry: Optional[Dict[str, Any]],
+        start_time: float,
+        retry_count: int,
+        n_samples: int = 1
+    ) -> Optional[Dict[str, Any]]:
+        """Turn a cache entry back into an extraction result (None on miss or stale entry)"""
+        if not entry:
+            return None
+
+        # Entries written before samples were cached only hold the consensus
+        if n_samples > 1 and "samples" not in entry:
+            return None
+
+        try:
+            VALIDATE_EXTRACTION(entry["data"])
+        except fastjsonschema.JsonSchemaException:
+            logger.warning("Ignoring cached extraction that no longer matches the schema")
+            return None
+
+        logger.info("Extraction cache hit (cached %s)", entry.get('cached_at'))
+        result = {
+            "success": True,
+            "data": entry["data"],
+            "processing_time": time.time() - start_time,
+            "tokens_used": 0,
+            "retry_count": retry_count,
+            "cached": True
+        }
+        if "samples" in entry:
+            result["samples"] = entry["samples"]
+        return result
+
+    def _blank_result(self, start_time: float, retry_count: int) -> Dict[str, Any]:
+        """Build the result for a page skipped as blank"""
+        logger.info("Blank page detected, skipping AI API call")
+        return {
+            "success": True,
+            "data": {
+                "page_type": "blank",
+                "detected_language": "unknown",
+                # Nothing to misread, so this must not trigger a higher DPI retry
+                "language_confidence": 1.0,
+                "content_blocks": []
+            },
+            "processing_time": time.time() - start_time,
+            "tokens_used": 0,
+            "retry_count": retry_count,
+            "blank": True
+        }
+
+    def _build_error(self, error: Exception, start_time: float, retry_count: int) -> Dict[str, Any]:
+        """Build a failed extraction result"""
+        processing_time = time.time() - start_time
+        logger.error("Extraction failed: %s", error)
+        return {
+            "success": False,
+            "error": str(error),
+            "processing_time": processing_time,
+            "tokens_used": 0,
+            "retry_count": retry_count
+        }
+
+    def _image_to_jpeg(self, image: Image.Image, max_side: Optional[int] = None) -> bytes:
+        """Encode PIL Image as JPEG bytes, capping the long edge at max_side pixels"""
+        # "high" detail is resized to fit 2048px server side, so larger pages only
+        # cost upload and encode time
+        max_side = max_side or settings.AI_MAX_IMAGE_SIDE
+        width, height = image.size
+        scale = min(1.0, max_side / max(width, height))
+        if scale < 1.0:
+            image = image.resize(
+                (max(1, int(width * scale)), max(1, int(height * scale))),
+                Image.BILINEAR
+            )
+
+        # JPEG stores RGB and grayscale natively; convert anything else to RGB
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        # getvalue() hands back the encoded bytes without a seek/read copy
+        with io.BytesIO() as buffer:
+            image.save(buffer, format='JPEG', quality=95)
+            return buffer.getvalue()
+
+    def _encode_group_page(self, image: Image.Image) -> Optional[Tuple[bytes, str]]:
+        """JPEG bytes and detail level for a page of a multi-page request (None if blank)"""
+        histogram = self._page_histogram(image)
+        if self._is_blank(histogram):
+            return None
+        return self._image_to_jpeg(image), self._choose_detail(image, histogram=histogram)
+
+    def _page_histogram(self, image: Image.Image) -> List[int]:
+        """Grayscale histogram of a page; statistics built on it need no pixel array"""
+        return image.convert('L').histogram()
+
+    def _is_blank(self, histogram: List[int]) -> bool:
+        """Check whether a page has (almost) no pixels contrasting with its background"""
+        total = sum(histogram)
+
+        # The background is the median grey level, so dark pages work too
+        cumulative = 0
+        for background, count in enumerate(histogram):
+            cumulative += count
+            if cumulative * 2 >= total:
+                break
+
+        ink = sum(
+            count for level, count in enumerate(histogram)
+            if abs(level - background) > self.INK_CONTRAST
+        )
+        return ink < total * self.BLANK_INK_RATIO
+
+    def _choose_detail(
+        self,
+        image: Image.Image,
+        retry_count: int = 0,
+        histogram: Optional[List[int]] = None
+    ) -> str:
+        """Pick the image detail level for a page; retries always use high detail"""
+        if retry_count:
+            return "high"
+        stddev = ImageStat.Stat(histogram or self._page_histogram(image)).stddev[0]
+        return "low" if stddev < self.LOW_DETAIL_STDDEV else "high"
+
+    def _image_too_large(self, error: Exception, max_side: int) -> bool:
+        """Check whether the API rejected the image size and a smaller retry is possible"""
+        return max_side // 2 >= self.MIN_IMAGE_SIDE and 'too large' in str(error).lower()
+
+    def _jpeg_data_url(self, image_bytes: bytes) -> str:
+        """Build the data URL for JPEG bytes, decoding the payload only once"""
+        return (b"data:image/jpeg;base64," + base64.b64encode(image_bytes)).decode('ascii')
+
+
+def aggregate_samples(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine several candidate extractions of one page into a consensus.
+
+    Page type and language are decided by majority vote. A block is kept
+    when a majority of samples contain its block_number, taking the most
+    confident version of it.
+
+    Args:
+        samples: Decoded extractions of the same page
+
+    Returns:
+        dict: Extraction with the same structure as a single sample
+    """
+    def majority(key):
+        return Counter(sample[key] for sample in samples).most_common(1)[0][0]
+
+    language = majority('detected_language')
+
+    versions: Dict[int, List[Dict[str, Any]]] = {}
+    for sample in samples:
+        # Count each block number at most once per sample
+        blocks = {block['block_number']: block for block in sample['content_blocks']}
+        for block_number, block in blocks.items():
+            versions.setdefault(block_number, []).append(block)
+
+    return {
+        "page_type": majority('page_type'),
+        "detected_language": language,
+        "language_confidence": max(
+            sample['language_confidence'] for sample in samples
+            if sample['detected_language'] == language
+        ),
+        "content_blocks": [
+            max(blocks, key=lambda block: block['confidence'])
+            for _, blocks in sorted(versions.items())
+            if len(blocks) * 2 > len(samples)
+        ]
+    }
+
+
+def schema_hash(schema: Dict[str, Any], digest_size: int = 16) -> str:
+    """Stable content hash of a JSON schema (key order independent)"""
+    canonical = json.dumps(schema, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=digest_size).hexdigest()
+
+
+# Schemas that can be compiled, keyed by their content hash
+_SCHEMAS_BY_HASH: Dict[str, Dict[str, Any]] = {}
+
+
+def register_schema(schema: Dict[str, Any]) -> str:
+    """Register a schema for compilation and return its hash"""
+    key = schema_hash(schema)
+    _SCHEMAS_BY_HASH.setdefault(key, schema)
+    return key
+
+
+@functools.lru_cache(maxsize=32)
+def get_validator(key: str):
+    """
+    Return the compiled validator for a registered schema hash.
+
+    fastjsonschema generates straight-line Python source specialised to the
+    schema's fixed keys, enums and required lists. Compilation happens once
+    per schema per process; the LRU bound caps memory if schemas ever vary.
+    The schemas declare no string formats, so format handlers are left out.
+    """
+    return fastjsonschema.compile(
+        _SCHEMAS_BY_HASH[key],
+        use_default=False,
+        use_formats=False,
+        detailed_exceptions=False
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_shared_client(api_key: Optional[str]) -> OpenAI:
+    """
+    Process-wide OpenAI client for an API key.
+
+    Extractors are created per upload; sharing the client keeps its
+    connection pool, so pages reuse warm keep-alive connections instead of
+    paying a TCP and TLS handshake per extractor.
+
+    The SDK retries rate limits, 5xx responses, timeouts and connection
+    errors itself with exponential backoff and jitter, honouring
+    Retry-After; AI_MAX_RETRIES sets how many times.
+    """
+    return OpenAI(api_key=api_key, max_retries=settings.AI_MAX_RETRIES)
+
+
+@functools.lru_cache(maxsize=None)
+def get_shared_async_client(api_key: Optional[str]) -> AsyncOpenAI:
+    """
+    Process-wide AsyncOpenAI client for an API key.
+
+    Its connection pool belongs to the loop it is first used on, so it
+    must only be awaited through run_in_background_loop.
+    """
+    return AsyncOpenAI(api_key=api_key, max_retries=settings.AI_MAX_RETRIES)
+
+
+def run_in_background_loop(coroutine):
+    """Run a coroutine on the shared background event loop and wait for it"""
+    global _background_loop
+    with _LOOP_LOCK:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_background_loop.run_forever,
+                name='ai-extract-loop',
+                daemon=True
+            ).start()
+    return asyncio.run_coroutine_threadsafe(coroutine, _background_loop).result()
+
+
+@functools.lru_cache(maxsize=None)
+def get_shared_extractor() -> "AIExtractor":
+    """
+    Process-wide AIExtractor built from settings.
+
+    The extractor holds no per-document state, so every processor can share
+    one. It is created on first use rather than at import because the client
+    needs API_KEY to be configured.
+    """
+    return AIExtractor()
+
+
+EXTRACTION_SCHEMA_HASH = register_schema(AIExtractor.EXTRACTION_SCHEMA['schema'])
+VALIDATE_EXTRACTION = get_validator(EXTRACTION_SCHEMA_HASH)
+
+# Short version tag of the full response format. Prefix cache keys for
+# anything derived from extraction output with it so that editing the
+# schema invalidates them automatically.
+SCHEMA_VERSION = schema_hash(AIExtractor.EXTRACTION_SCHEMA, digest_size=8)
+
+# Request parts shared by every page, built once per process
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": AIExtractor.EXTRACTION_SCHEMA
+}
+MULTI_PAGE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "multi_page_extraction",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "pages": {
+                    "type": "array",
+                    "items": AIExtractor.EXTRACTION_SCHEMA["schema"]
+                }
+            },
+            "required": ["pages"],
+            "additionalProperties": False
+        }
+    }
+}
+_PROMPT_BYTES = EXTRACTION_PROMPT.encode('utf-8')
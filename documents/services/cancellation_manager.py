@@ -11,6 +11,9 @@ logger = logging.getLogger(__name__)
 class CancellationManager:
     """
     Thread-safe manager for tracking document processing cancellations.
+
+    Cancelled IDs are held in a frozenset that writers replace under a lock,
+    so the frequently polled is_cancelled can read it without locking.
     """
     _instance = None
     _lock = threading.Lock()
@@ -20,7 +23,7 @@ class CancellationManager:
             with cls._lock:
                 if cls._instance is None:
                     cls._instance = super().__new__(cls)
-                    cls._instance._cancelled_docs = set()
+                    cls._instance._cancelled_docs = frozenset()
                     cls._instance._cancel_lock = threading.Lock()
         return cls._instance
 
@@ -32,9 +35,8 @@ class CancellationManager:
             document_id: ID of the document to cancel
         """
         with self._cancel_lock:
-            self._cancelled_docs.add(document_id)
-            print(f"[CANCELLATION_MANAGER] Added {document_id} to cancelled set. Set is now: {self._cancelled_docs}")
-            logger.info(f"Cancellation requested for document {document_id}")
+            self._cancelled_docs = self._cancelled_docs | {document_id}
+            logger.info("Cancellation requested for document %s", document_id)
 
     def is_cancelled(self, document_id: int) -> bool:
         """
@@ -46,10 +48,7 @@ class CancellationManager:
         Returns:
             bool: True if cancellation was requested
         """
-        with self._cancel_lock:
-            result = document_id in self._cancelled_docs
-            print(f"[CANCELLATION_MANAGER] Checking if {document_id} is cancelled. Set: {self._cancelled_docs}, Result: {result}")
-            return result
+        return document_id in self._cancelled_docs
 
     def clear_cancellation(self, document_id: int):
         """
@@ -59,14 +58,13 @@ class CancellationManager:
             document_id: ID of the document
         """
         with self._cancel_lock:
-            self._cancelled_docs.discard(document_id)
-            print(f"[CANCELLATION_MANAGER] Cleared {document_id} from cancelled set. Set is now: {self._cancelled_docs}")
-            logger.info(f"Cancellation cleared for document {document_id}")
+            self._cancelled_docs = self._cancelled_docs - {document_id}
+            logger.debug("Cancellation cleared for document %s", document_id)
 
     def reset(self):
         """Clear all cancellation requests."""
         with self._cancel_lock:
-            self._cancelled_docs.clear()
+            self._cancelled_docs = frozenset()
 
 
 # Singleton instance
@@ -4,31 +4,47 @@ Orchestrates document ingestion, rotation detection, content extraction, and sto
 """
 import io
 import time
+import functools
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from PIL import Image
 import fitz  # PyMuPDF
 from django.conf import settings
 from django.core.files.base import ContentFile
 from django.utils import timezone
+from django.db import connection, transaction
 from django.db.utils import IntegrityError
 
+from ..exports import store_exports
 from ..models import Document, Page, ContentBlock, TableCell, FormField, ExtractionLog
-from .rotation_detector import RotationDetector
-from .ai_extractor import AIExtractor
+from .rotation_detector import rotation_detector
+from .ai_extractor import get_shared_extractor
 # Import from __init__.py to ensure same singleton instance as views.py
 from documents.services import cancellation_manager
 
 logger = logging.getLogger(__name__)
 
+# PyMuPDF is not thread-safe, not even with one fitz.Document per thread
+# (MuPDF's context is global), so every fitz call in the process is made
+# while holding this lock
+_FITZ_LOCK = threading.Lock()
+
 
 class DocumentProcessor:
     """Main document processing pipeline"""
 
+    # PDF pages with at least this many words in their text layer are
+    # born-digital: text is upright by construction, so rotation detection
+    # is skipped for them
+    TEXT_LAYER_MIN_WORDS = 20
+
     def __init__(self):
-        self.rotation_detector = RotationDetector()
-        self.ai_extractor = AIExtractor()
+        self.rotation_detector = rotation_detector
+        self.ai_extractor = get_shared_extractor()
 
     def process_document(self, document: Document) -> bool:
         """
@@ -43,31 +59,25 @@ class DocumentProcessor:
         start_time = time.time()
 
         try:
-            print(f"\n{'='*80}")
-            print(f"📄 PROCESSING STARTED: Document #{document.id} - '{document.title}'")
-            print(f"   File: {document.original_filename}")
-            print(f"   Type: {document.file_type}")
-            print(f"{'='*80}\n")
-            logger.info(f"Starting processing for document: {document.title}")
+            logger.info("Starting processing for document #%s: %s (%s)", document.id, document.title, document.file_type)
 
             # Clear any previous cancellation flags
             cancellation_manager.clear_cancellation(document.id)
 
             # Update status to processing
             document.status = 'processing'
-            document.save()
+            document.save(update_fields=['status'])
 
             # Immediately check if document was cancelled externally (e.g., via API)
             # Refresh from DB to get latest status
             document.refresh_from_db()
             if document.status == 'cancelled':
-                print(f"[CHECKPOINT 0] Document was cancelled externally! Stopping...")
+                logger.info("Document %s was cancelled before processing started", document.id)
                 raise InterruptedError("Processing cancelled by user")
 
             # Check for cancellation before starting
-            print(f"[CHECKPOINT 1] Checking cancellation for doc {document.id}: {cancellation_manager.is_cancelled(document.id)}")
             if cancellation_manager.is_cancelled(document.id):
-                print(f"[CHECKPOINT 1] CANCELLATION DETECTED! Stopping...")
+                logger.info("Cancellation detected before processing started")
                 raise InterruptedError("Processing cancelled by user")
 
             # Determine file type and process accordingly
@@ -89,26 +99,22 @@ class DocumentProcessor:
             document.status = 'completed'
             document.processed_at = timezone.now()
             document.processing_time = time.time() - start_time
-            document.save()
+            document.save(update_fields=['total_pages', 'status', 'processed_at', 'processing_time'])
+
+            # Downloads fall back to building exports on the fly if this fails
+            try:
+                store_exports(document)
+            except Exception:
+                logger.exception("Could not store exports for document #%s", document.id)
 
             # Clear cancellation flag on success
             cancellation_manager.clear_cancellation(document.id)
 
-            print(f"\n{'='*80}")
-            print(f"✅ PROCESSING COMPLETED: Document #{document.id} - '{document.title}'")
-            print(f"   Pages: {document.total_pages}")
-            print(f"   Time: {document.processing_time:.2f}s")
-            print(f"{'='*80}\n")
-            logger.info(f"Document processed successfully in {document.processing_time:.2f}s")
+            logger.info("Document #%s processed successfully: %d pages in %.2fs", document.id, document.total_pages, document.processing_time)
             return True
 
         except InterruptedError as e:
-            print(f"\n{'='*80}")
-            print(f"❌ PROCESSING CANCELLED: Document #{document.id} - '{document.title}'")
-            print(f"   Reason: {str(e)}")
-            print(f"   Time before cancel: {time.time() - start_time:.2f}s")
-            print(f"{'='*80}\n")
-            logger.info(f"Document processing cancelled: {str(e)}")
+            logger.info("Document #%s processing cancelled after %.2fs: %s", document.id, time.time() - start_time, e)
             
             # Check if document still exists before saving
             try:
@@ -118,21 +124,16 @@ class DocumentProcessor:
                     document.status = 'cancelled'
                     document.error_message = str(e)
                     document.processing_time = time.time() - start_time
-                    document.save()
+                    document.save(update_fields=['status', 'error_message', 'processing_time'])
                 else:
-                    logger.info(f"Document {document.id} was already marked as cancelled")
+                    logger.info("Document %s was already marked as cancelled", document.id)
             except Document.DoesNotExist:
-                logger.info(f"Document {document.id} was deleted during processing")
+                logger.info("Document %s was deleted during processing", document.id)
             
             cancellation_manager.clear_cancellation(document.id)
             return False
         except Exception as e:
-            print(f"\n{'='*80}")
-            print(f"💥 PROCESSING FAILED: Document #{document.id} - '{document.title}'")
-            print(f"   Error: {str(e)}")
-            print(f"   Time before failure: {time.time() - start_time:.2f}s")
-            print(f"{'='*80}\n")
-            logger.error(f"Document processing failed: {str(e)}", exc_info=True)
+            logger.error("Document #%s processing failed after %.2fs: %s", document.id, time.time() - start_time, e, exc_info=True)
             
             # Check if document still exists before saving
             try:
@@ -140,65 +141,93 @@ class DocumentProcessor:
                 document.status = 'failed'
                 document.error_message = str(e)
                 document.processing_time = time.time() - start_time
-                document.save()
+                document.save(update_fields=['status', 'error_message', 'processing_time'])
             except Document.DoesNotExist:
-                logger.info(f"Document {document.id} was deleted during processing")
+                logger.info("Document %s was deleted during processing", document.id)
             
             cancellation_manager.clear_cancellation(document.id)
             return False
 
     def _process_pdf(self, document: Document, file_path: str) -> List[Page]:
         """Process a PDF document"""
-        logger.info(f"Processing PDF: {file_path}")
+        logger.info("Processing PDF: %s", file_path)
 
         pages = []
-        pdf_document = fitz.open(file_path)
+        with _FITZ_LOCK:
+            pdf_document = fitz.open(file_path)
+            page_count = len(pdf_document)
+
+        # Pages are rendered here, one at a time, while rotation detection,
+        # the AI call and storage of earlier pages run on worker threads.
+        # OpenCV, Pillow and the HTTP wait all release the GIL, so the stages
+        # overlap. Workers re-render low-confidence pages from this same
+        # pdf_document; every use of it holds _FITZ_LOCK.
+        workers = settings.PAGE_WORKERS
+        batch_size = max(1, settings.AI_BATCH_SIZE)
+
+        # Every page is rendered at the same DPI
+        dpi = settings.DEFAULT_DPI
+        zoom = dpi / 72  # 72 is the default DPI
+        mat = fitz.Matrix(zoom, zoom)
+
+        batch = []
+        in_flight = deque()
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'document-{document.id}')
 
         try:
-            for page_num in range(len(pdf_document)):
+            for page_num in range(page_count):
                 # Check for cancellation between pages
-                print(f"[CHECKPOINT 2] Page {page_num + 1}: Checking cancellation for doc {document.id}: {cancellation_manager.is_cancelled(document.id)}")
-                
                 # Refresh document from DB to check if it was cancelled externally
                 document.refresh_from_db()
                 if document.status == 'cancelled' or cancellation_manager.is_cancelled(document.id):
-                    print(f"[CHECKPOINT 2] CANCELLATION DETECTED at page {page_num + 1}! Stopping...")
-                    logger.info(f"Cancellation detected at page {page_num + 1}")
+                    logger.info("Cancellation detected at page %d", page_num + 1)
                     raise InterruptedError("Processing cancelled by user")
 
-                print(f"📑 Processing page {page_num + 1}/{len(pdf_document)} of Document #{document.id}")
-                logger.info(f"Processing page {page_num + 1}/{len(pdf_document)}")
+                logger.info("Processing page %d/%d of document #%s", page_num + 1, page_count, document.id)
 
-                # Get page
-                pdf_page = pdf_document[page_num]
+                with _FITZ_LOCK:
+                    # Get page
+                    pdf_page = pdf_document[page_num]
 
-                # Render page to image at specified DPI
-                dpi = settings.DEFAULT_DPI
-                zoom = dpi / 72  # 72 is the default DPI
-                mat = fitz.Matrix(zoom, zoom)
-                pix = pdf_page.get_pixmap(matrix=mat)
+                    # Render page to image at specified DPI
+                    pix = pdf_page.get_pixmap(matrix=mat)
 
-                # Convert to PIL Image
-                img_data = pix.tobytes("jpeg")
-                image = Image.open(io.BytesIO(img_data))
+                    # Convert to PIL Image straight from the raw RGB samples
+                    image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
 
-                # Process page
-                page = self._process_page(
-                    document=document,
-                    page_number=page_num + 1,
-                    image=image,
-                    dpi=dpi
-                )
-                pages.append(page)
+                    # Pages with a text layer render upright (the pixmap honours /Rotate)
+                    detect_rotation = len(pdf_page.get_text("words")) < self.TEXT_LAYER_MIN_WORDS
+
+                # Process pages on a worker thread, AI_BATCH_SIZE at a time
+                batch.append((page_num + 1, image, detect_rotation))
+                if len(batch) < batch_size:
+                    continue
+                in_flight.append(executor.submit(self._process_pages_task, document.id, batch, dpi, pdf_document))
+                batch = []
+
+                # Backpressure: bound the rendered pages held in memory
+                while len(in_flight) >= workers * 2:
+                    pages.extend(in_flight.popleft().result())
+
+            if batch:
+                in_flight.append(executor.submit(self._process_pages_task, document.id, batch, dpi, pdf_document))
+
+            while in_flight:
+                pages.extend(in_flight.popleft().result())
 
         finally:
-            pdf_document.close()
+            # On failure or cancellation, drop pages that have not started
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=True)
+            with _FITZ_LOCK:
+                pdf_document.close()
 
         return pages
 
     def _process_image(self, document: Document, file_path: str) -> List[Page]:
         """Process a single image file"""
-        logger.info(f"Processing image: {file_path}")
+        logger.info("Processing image: %s", file_path)
 
         # Open image
         image = Image.open(file_path)
@@ -213,12 +242,47 @@ class DocumentProcessor:
 
         return [page]
 
+    def _process_pages_task(
+        self,
+        document_id: int,
+        batch: List[Tuple[int, Image.Image, bool]],
+        dpi: int,
+        pdf_document: Optional[fitz.Document] = None
+    ) -> List[Page]:
+        """
+        Process a batch of (page_number, image, detect_rotation) tuples on a
+        worker thread.
+
+        Each task loads its own Document instance, since processing
+        refreshes it from the database, and closes the thread's database
+        connection afterwards because Django does not manage these threads.
+        """
+        try:
+            document = Document.objects.get(pk=document_id)
+            if len(batch) == 1:
+                page_number, image, detect_rotation = batch[0]
+                return [self._process_page(
+                    document=document,
+                    page_number=page_number,
+                    image=image,
+                    dpi=dpi,
+                    detect_rotation=detect_rotation,
+                    pdf_document=pdf_document
+                )]
+            return self._process_page_batch(document, batch, dpi, pdf_document)
+        except Document.DoesNotExist:
+            raise InterruptedError("Document was deleted during processing")
+        finally:
+            connection.close()
+
     def _process_page(
         self,
         document: Document,
         page_number: int,
         image: Image.Image,
-        dpi: int
+        dpi: int,
+        detect_rotation: bool = True,
+        pdf_document: Optional[fitz.Document] = None
     ) -> Page:
         """
         Process a single page.
@@ -228,145 +292,242 @@ class DocumentProcessor:
             page_number: Page number (1-indexed)
             image: PIL Image of the page
             dpi: DPI used for processing
+            detect_rotation: Whether to detect and correct page rotation
+            pdf_document: Source PDF for higher-DPI retries (None for images)
 
         Returns:
             Page: Created page instance
         """
-        logger.info(f"Processing page {page_number}")
+        page, corrected_image = self._prepare_page(document, page_number, image, dpi, detect_rotation)
+
+        # Step 3: Extract content using AI
+        logger.debug("Extracting content with AI...")
+        logs = []
+        extraction_result = self._extract_content(
+            page, corrected_image, logs, retry_on_low_confidence=True, pdf_document=pdf_document
+        )
+
+        self._store_page_result(document, page, extraction_result, logs)
+        return page
+
+    def _process_page_batch(
+        self,
+        document: Document,
+        batch: List[Tuple[int, Image.Image, bool]],
+        dpi: int,
+        pdf_document: Optional[fitz.Document] = None
+    ) -> List[Page]:
+        """
+        Process several pages with a single AI request.
+
+        The prompt and schema are sent once for the whole batch; pages with
+        low confidence are still retried individually at higher DPI.
+
+        Args:
+            document: Parent document
+            batch: (page_number, image, detect_rotation) tuples
+            dpi: DPI used for processing
+            pdf_document: Source PDF for higher-DPI retries (None for images)
+
+        Returns:
+            list: Created page instances, in batch order
+        """
+        prepared = [
+            self._prepare_page(document, page_number, image, dpi, detect_rotation)
+            for page_number, image, detect_rotation in batch
+        ]
+
+        # Step 3: Extract content for all pages at once
+        logger.debug("Extracting batch content with AI...")
+        results = self.ai_extractor.extract_multiple_pages_sync(
+            [corrected_image for _, corrected_image in prepared],
+            max_per_call=len(prepared)
+        )
+
+        for (page, corrected_image), result in zip(prepared, results):
+            logs = []
+            extraction_result = self._extract_content(
+                page, corrected_image, logs, retry_on_low_confidence=True, result=result,
+                pdf_document=pdf_document
+            )
+            self._store_page_result(document, page, extraction_result, logs)
+
+        return [page for page, _ in prepared]
+
+    def _prepare_page(
+        self,
+        document: Document,
+        page_number: int,
+        image: Image.Image,
+        dpi: int,
+        detect_rotation: bool = True
+    ) -> Tuple[Page, Image.Image]:
+        """
+        Detect rotation and build the (unsaved) page record with its images.
+
+        Args:
+            document: Parent document
+            page_number: Page number (1-indexed)
+            image: PIL Image of the page
+            dpi: DPI used for processing
+            detect_rotation: Whether to detect and correct page rotation
+
+        Returns:
+            tuple: (page, corrected_image) ready for extraction
+        """
+        logger.debug("Processing page %d", page_number)
 
         # Check for cancellation before processing page
-        print(f"[CHECKPOINT 3] Before processing page {page_number}: Checking cancellation for doc {document.id}: {cancellation_manager.is_cancelled(document.id)}")
-        
         # Refresh document from DB to check if it was cancelled externally
         document.refresh_from_db()
         if document.status == 'cancelled' or cancellation_manager.is_cancelled(document.id):
-            print(f"[CHECKPOINT 3] CANCELLATION DETECTED before processing page {page_number}! Stopping...")
-            logger.info(f"Cancellation detected before processing page {page_number}")
+            logger.info("Cancellation detected before processing page %d", page_number)
             raise InterruptedError("Processing cancelled by user")
 
-        # Step 1: Save original image (before rotation)
-        original_to_save = image.copy()
-        if original_to_save.mode == 'RGBA':
-            rgb_image = Image.new('RGB', original_to_save.size, (255, 255, 255))
-            rgb_image.paste(original_to_save, mask=original_to_save.split()[3])
-            original_to_save = rgb_image
-        elif original_to_save.mode not in ('RGB', 'L'):
-            original_to_save = original_to_save.convert('RGB')
+        # Step 1: Flatten to a JPEG-compatible mode (before rotation)
+        image = self._to_jpeg_mode(image)
 
         # Step 2: Detect rotation
-        logger.debug("Detecting rotation...")
-        corrected_image, rotation_angle = self.rotation_detector.detect_and_correct(image)
-
-        # Step 3: Create page record
-        try:
-            # Check if document still exists
-            document.refresh_from_db()
-            
-            page = Page.objects.create(
-                document=document,
-                page_number=page_number,
-                width=corrected_image.width,
-                height=corrected_image.height,
-                detected_rotation=rotation_angle,
-                applied_rotation=rotation_angle,
-                dpi=dpi,
-                processed=False
-            )
-        except (Document.DoesNotExist, IntegrityError) as e:
-            logger.info(f"Could not create page: Document was deleted ({str(e)})")
-            raise InterruptedError("Document was deleted during processing")
+        if detect_rotation:
+            logger.debug("Detecting rotation...")
+            corrected_image, rotation_angle = self.rotation_detector.detect_and_correct(image)
+        else:
+            corrected_image, rotation_angle = image, 0
+
+        # Step 3: Build page record (inserted once extraction is done)
+        page = Page(
+            document=document,
+            page_number=page_number,
+            width=corrected_image.width,
+            height=corrected_image.height,
+            detected_rotation=rotation_angle,
+            applied_rotation=rotation_angle,
+            dpi=dpi,
+            processed=False
+        )
 
         # Save original image
-        orig_buffer = io.BytesIO()
-        original_to_save.save(orig_buffer, format='JPEG', quality=95)
-        orig_buffer.seek(0)
+        original_jpeg = self._encode_jpeg(image)
         page.original_image.save(
             f'page_original_{document.id}_{page_number}.jpg',
-            ContentFile(orig_buffer.read()),
+            ContentFile(original_jpeg),
             save=False
         )
 
-        # Save corrected/rotated image
-        # Convert RGBA to RGB if necessary (for PNG with transparency)
-        if corrected_image.mode == 'RGBA':
-            # Create a white background
-            rgb_image = Image.new('RGB', corrected_image.size, (255, 255, 255))
-            rgb_image.paste(corrected_image, mask=corrected_image.split()[3])  # Use alpha channel as mask
-            corrected_image = rgb_image
-        elif corrected_image.mode not in ('RGB', 'L'):
-            # Convert other modes to RGB
-            corrected_image = corrected_image.convert('RGB')
-
-        img_buffer = io.BytesIO()
-        corrected_image.save(img_buffer, format='JPEG', quality=95)
-        img_buffer.seek(0)
+        # Save corrected/rotated image (identical to the original when unrotated)
+        corrected_jpeg = original_jpeg if rotation_angle == 0 else self._encode_jpeg(corrected_image)
         page.image.save(
             f'page_{document.id}_{page_number}.jpg',
-            ContentFile(img_buffer.read()),
-            save=True
+            ContentFile(corrected_jpeg),
+            save=False
         )
 
         # Check for cancellation before expensive AI call
-        print(f"[CHECKPOINT 4] Before AI call on page {page_number}: Checking cancellation for doc {page.document.id}: {cancellation_manager.is_cancelled(page.document.id)}")
-        
         # Refresh document from DB to check if it was cancelled externally
-        page.document.refresh_from_db()
-        if page.document.status == 'cancelled' or cancellation_manager.is_cancelled(page.document.id):
-            print(f"[CHECKPOINT 4] CANCELLATION DETECTED before AI call! Stopping...")
-            logger.info(f"Cancellation detected before AI extraction on page {page_number}")
+        try:
+            document.refresh_from_db()
+        except Document.DoesNotExist:
+            self._delete_page_images(page)
+            raise InterruptedError("Document was deleted during processing")
+        if document.status == 'cancelled' or cancellation_manager.is_cancelled(document.id):
+            logger.info("Cancellation detected before AI extraction on page %d", page_number)
+            self._delete_page_images(page)
             raise InterruptedError("Processing cancelled by user")
 
-        # Step 3: Extract content using AI
-        print(f"🤖 Calling AI API for page {page_number} of Document #{page.document.id}...")
-        logger.debug("Extracting content with AI...")
-        extraction_result = self._extract_content(page, corrected_image, retry_on_low_confidence=True)
+        return page, corrected_image
 
-        if extraction_result['success']:
-            # Step 4: Store extracted content
-            logger.debug("Storing extracted content...")
-            try:
-                # Check if document still exists before storing
-                document.refresh_from_db()
-                page.refresh_from_db()
-                
-                self._store_extraction_result(page, extraction_result['data'])
+    def _to_jpeg_mode(self, image: Image.Image) -> Image.Image:
+        """Convert an image to a mode JPEG can store (RGB or L)"""
+        # Convert RGBA to RGB if necessary (for PNG with transparency)
+        if image.mode == 'RGBA':
+            # Create a white background
+            rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+            rgb_image.paste(image, mask=image.getchannel('A'))  # Use alpha channel as mask
+            return rgb_image
+        elif image.mode not in ('RGB', 'L'):
+            # Convert other modes to RGB
+            return image.convert('RGB')
+        return image
 
-                # Update page
-                page.processed = True
-                page.save()
-            except (Document.DoesNotExist, Page.DoesNotExist, IntegrityError) as e:
-                logger.info(f"Could not store extraction result: Document or page was deleted ({str(e)})")
-                raise InterruptedError("Document was deleted during processing")
+    def _encode_jpeg(self, image: Image.Image) -> bytes:
+        """Encode a page image for storage"""
+        with io.BytesIO() as buffer:
+            image.save(buffer, format='JPEG', quality=settings.PAGE_JPEG_QUALITY)
+            return buffer.getvalue()
 
-        return page
+    def _delete_page_images(self, page: Page):
+        """Remove the stored images of a page that will not be inserted"""
+        page.original_image.delete(save=False)
+        page.image.delete(save=False)
+
+    def _store_page_result(
+        self,
+        document: Document,
+        page: Page,
+        extraction_result: Dict[str, Any],
+        logs: List[ExtractionLog]
+    ):
+        """
+        Insert the page together with its extraction logs and content.
+
+        The page row is only written once extraction is over, in one
+        transaction with everything that references it, so a cancelled page
+        leaves no half-populated row behind and a processed page costs a
+        single INSERT instead of an INSERT followed by UPDATEs.
+        """
+        try:
+            # Check if document still exists and was not cancelled meanwhile
+            document.refresh_from_db()
+            if document.status == 'cancelled' or cancellation_manager.is_cancelled(document.id):
+                logger.info("Cancellation detected before storing page %d", page.page_number)
+                raise InterruptedError("Processing cancelled by user")
+
+            with transaction.atomic():
+                if extraction_result['success']:
+                    # Step 4: Store extracted content
+                    logger.debug("Storing extracted content...")
+                    self._store_extraction_result(page, extraction_result['data'])
+                else:
+                    page.save()
+                ExtractionLog.objects.bulk_create(logs)
+        except (Document.DoesNotExist, IntegrityError) as e:
+            logger.info("Could not store page: Document was deleted (%s)", e)
+            self._delete_page_images(page)
+            raise InterruptedError("Document was deleted during processing")
+        except InterruptedError:
+            self._delete_page_images(page)
+            raise
 
     def _extract_content(
         self,
         page: Page,
         image: Image.Image,
+        logs: List[ExtractionLog],
         retry_on_low_confidence: bool = True,
-        retry_count: int = 0
+        retry_count: int = 0,
+        result: Optional[Dict[str, Any]] = None,
+        pdf_document: Optional[fitz.Document] = None
     ) -> Dict[str, Any]:
         """
         Extract content from page using AI.
 
         Args:
-            page: Page instance
+            page: Page instance (not yet saved)
             image: PIL Image
+            logs: Collects an unsaved ExtractionLog per attempt, inserted with the page
             retry_on_low_confidence: Whether to retry at higher DPI if confidence is low
             retry_count: Current retry count
+            result: Result already fetched for this page (e.g. by a batch request)
+            pdf_document: Source PDF to re-render the page from (None for images)
 
         Returns:
             dict: Extraction result
         """
         # Check for cancellation before AI API call (redundant but safe)
-        print(f"[CHECKPOINT 4b] Inside _extract_content: Checking cancellation for doc {page.document.id}: {cancellation_manager.is_cancelled(page.document.id)}")
-        
         # Refresh document from DB to check if it was cancelled externally
         page.document.refresh_from_db()
         if page.document.status == 'cancelled' or cancellation_manager.is_cancelled(page.document.id):
-            print(f"[CHECKPOINT 4b] CANCELLATION DETECTED in _extract_content! Stopping...")
-            logger.info(f"Cancellation detected in _extract_content")
+            logger.info("Cancellation detected in _extract_content")
             return {
                 'success': False,
                 'error': 'Processing cancelled by user',
@@ -376,16 +537,14 @@ class DocumentProcessor:
             }
 
         # Extract content
-        result = self.ai_extractor.extract_page_content(image, retry_count=retry_count)
+        if result is None:
+            result = self.ai_extractor.extract_page_content(image, retry_count=retry_count)
 
         # Check for cancellation immediately after AI call (catches cancellations during API call)
-        print(f"[CHECKPOINT 5] After AI call returned: Checking cancellation for doc {page.document.id}: {cancellation_manager.is_cancelled(page.document.id)}")
-        
         # Refresh document from DB to check if it was cancelled externally
         page.document.refresh_from_db()
         if page.document.status == 'cancelled' or cancellation_manager.is_cancelled(page.document.id):
-            print(f"[CHECKPOINT 5] CANCELLATION DETECTED after AI call! Stopping...")
-            logger.info(f"Cancellation detected after AI extraction")
+            logger.info("Cancellation detected after AI extraction")
             return {
                 'success': False,
                 'error': 'Processing cancelled by user',
@@ -394,48 +553,33 @@ class DocumentProcessor:
                 'retry_count': retry_count
             }
 
-        # Log extraction attempt (only if document still exists)
-        try:
-            # Verify document and page still exist
-            page.document.refresh_from_db()
-            page.refresh_from_db()
-            
-            ExtractionLog.objects.create(
-                document=page.document,
-                page=page,
-                request_data={'dpi': page.dpi, 'retry_count': retry_count},
-                response_data=result.get('data'),
-                success=result['success'],
-                error_message=result.get('error', ''),
-                processing_time=result['processing_time'],
-                tokens_used=result['tokens_used'],
-                retry_count=retry_count
-            )
-        except (Document.DoesNotExist, Page.DoesNotExist, IntegrityError) as e:
-            # Document or page was deleted during processing - log and continue
-            logger.info(f"Could not create ExtractionLog: Document or page no longer exists ({str(e)})")
-            return {
-                'success': False,
-                'error': 'Document was deleted during processing',
-                'processing_time': result.get('processing_time', 0.0),
-                'tokens_used': result.get('tokens_used', 0),
-                'retry_count': retry_count
-            }
-
-        # Check if we should retry at higher DPI
+        # Log extraction attempt
+        logs.append(ExtractionLog(
+            document_id=page.document_id,
+            page=page,
+            request_data={'dpi': page.dpi, 'retry_count': retry_count},
+            response_data=result.get('data'),
+            success=result['success'],
+            error_message=result.get('error', ''),
+            processing_time=result['processing_time'],
+            tokens_used=result['tokens_used'],
+            retry_count=retry_count
+        ))
+
+        # Check if we should retry at higher DPI (only PDFs can be re-rendered)
         if (
             result['success'] and
             retry_on_low_confidence and
             retry_count == 0 and
+            pdf_document is not None and
+            page.dpi < settings.HIGH_DPI and
             self._should_retry_at_higher_dpi(result['data'])
         ):
             logger.info("Low confidence detected, retrying at higher DPI...")
 
             # Check for cancellation before retry
-            print(f"[CHECKPOINT 6] Before retry at higher DPI: Checking cancellation for doc {page.document.id}: {cancellation_manager.is_cancelled(page.document.id)}")
             if cancellation_manager.is_cancelled(page.document.id):
-                print(f"[CHECKPOINT 6] CANCELLATION DETECTED before retry! Stopping...")
-                logger.info(f"Cancellation detected before retry")
+                logger.info("Cancellation detected before retry")
                 return {
                     'success': False,
                     'error': 'Processing cancelled by user',
@@ -445,12 +589,13 @@ class DocumentProcessor:
                 }
 
             # Re-render page at higher DPI
-            high_dpi_image = self._render_page_at_dpi(page, settings.HIGH_DPI)
+            high_dpi_image = self._render_page_at_dpi(pdf_document, page, settings.HIGH_DPI)
 
             # Retry extraction
             return self._extract_content(
                 page=page,
                 image=high_dpi_image,
+                logs=logs,
                 retry_on_low_confidence=False,
                 retry_count=retry_count + 1
             )
@@ -470,16 +615,23 @@ class DocumentProcessor:
 
         return False
 
-    def _render_page_at_dpi(self, page: Page, dpi: int) -> Image.Image:
-        """Re-render a page at specified DPI"""
-        # This is a simplified version - in production you'd re-render from original
-        # For now, just return the existing image
-        return Image.open(page.image.path)
+    def _render_page_at_dpi(self, pdf_document: fitz.Document, page: Page, dpi: int) -> Image.Image:
+        """Re-render a page of the open source PDF at specified DPI"""
+        zoom = dpi / 72
+        with _FITZ_LOCK:
+            pix = pdf_document[page.page_number - 1].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+        return self.rotation_detector.apply_rotation(image, page.applied_rotation)
 
     def _store_extraction_result(self, page: Page, data: Dict[str, Any]):
         """
         Store extraction result in database.
 
+        Saves the page as processed, then writes its rows with a single
+        batched INSERT per model instead of one round-trip per row. Callers
+        run this inside a transaction.
+
         Args:
             page: Page instance
             data: Extracted data dictionary
@@ -488,18 +640,38 @@ class DocumentProcessor:
         page.detected_language = data.get('detected_language', 'unknown')
         page.language_confidence = data.get('language_confidence', 0.0)
         page.page_type = data.get('page_type', '')
+        page.processed = True
         page.save()
 
-        # Store content blocks
-        for block_data in data.get('content_blocks', []):
-            self._store_content_block(page, block_data)
+        blocks_data = data.get('content_blocks', [])
+
+        # Store content blocks (primary keys are set on the returned objects)
+        blocks = ContentBlock.objects.bulk_create(
+            [self._build_content_block(page, block_data) for block_data in blocks_data],
+            batch_size=500
+        )
+
+        cells = []
+        fields = []
+        for block, block_data in zip(blocks, blocks_data):
+            # Collect table cells if present
+            table_data = block_data.get('table_data', {})
+            if table_data and table_data.get('rows'):
+                cells.extend(self._build_table_cells(block, table_data))
+
+            # Collect form fields if present
+            form_data = block_data.get('form_data', {})
+            if form_data and form_data.get('fields'):
+                fields.extend(self._build_form_fields(block, form_data))
+
+        TableCell.objects.bulk_create(cells, batch_size=1000)
+        FormField.objects.bulk_create(fields, batch_size=1000)
 
-    def _store_content_block(self, page: Page, block_data: Dict[str, Any]):
-        """Store a single content block"""
+    def _build_content_block(self, page: Page, block_data: Dict[str, Any]) -> ContentBlock:
+        """Build an unsaved content block"""
         bbox = block_data.get('bbox', {})
 
-        # Create content block
-        block = ContentBlock.objects.create(
+        return ContentBlock(
             page=page,
             block_number=block_data['block_number'],
             block_type=block_data['block_type'],
@@ -514,22 +686,13 @@ class DocumentProcessor:
             form_data=block_data.get('form_data', {})
         )
 
-        # Store table cells if present
-        table_data = block_data.get('table_data', {})
-        if table_data and table_data.get('rows'):
-            self._store_table_cells(block, table_data)
-
-        # Store form fields if present
-        form_data = block_data.get('form_data', {})
-        if form_data and form_data.get('fields'):
-            self._store_form_fields(block, form_data)
-
-    def _store_table_cells(self, block: ContentBlock, table_data: Dict[str, Any]):
-        """Store table cells from table data"""
+    def _build_table_cells(self, block: ContentBlock, table_data: Dict[str, Any]) -> List[TableCell]:
+        """Build unsaved table cells from table data"""
+        cells = []
         for row_data in table_data.get('rows', []):
             row_index = row_data['row_index']
             for cell_data in row_data.get('cells', []):
-                TableCell.objects.create(
+                cells.append(TableCell(
                     content_block=block,
                     row_index=row_index,
                     column_path=cell_data['column_path'],
@@ -537,22 +700,24 @@ class DocumentProcessor:
                     rowspan=cell_data.get('rowspan', 1),
                     colspan=cell_data.get('colspan', 1),
                     is_header=False  # Can be enhanced
-                )
+                ))
 
         # Store headers as special rows
         for header_data in table_data.get('headers', []):
-            TableCell.objects.create(
+            cells.append(TableCell(
                 content_block=block,
                 row_index=-1,  # Special index for headers
                 column_path=header_data['column_path'],
                 text=header_data.get('text', ''),
                 is_header=True
-            )
+            ))
+
+        return cells
 
-    def _store_form_fields(self, block: ContentBlock, form_data: Dict[str, Any]):
-        """Store form fields from form data"""
-        for idx, field_data in enumerate(form_data.get('fields', [])):
-            FormField.objects.create(
+    def _build_form_fields(self, block: ContentBlock, form_data: Dict[str, Any]) -> List[FormField]:
+        """Build unsaved form fields from form data"""
+        return [
+            FormField(
                 content_block=block,
                 field_name=field_data['field_name'],
                 field_label=field_data.get('field_label', ''),
@@ -561,3 +726,17 @@ class DocumentProcessor:
                 is_filled=field_data.get('is_filled', False),
                 field_order=idx
             )
+            for idx, field_data in enumerate(form_data.get('fields', []))
+        ]
+
+
+@functools.lru_cache(maxsize=None)
+def get_document_processor() -> DocumentProcessor:
+    """
+    Process-wide DocumentProcessor.
+
+    The processor keeps no per-document state, and the rotation detector and
+    AI extractor it holds are shared already, so every upload, reprocess and
+    Celery task can use one instance.
+    """
+    return DocumentProcessor()
@@ -13,6 +13,17 @@ logger = logging.getLogger(__name__)
 class RotationDetector:
     """Detects and corrects document rotation"""
 
+    # Longest side the page is downsampled to before scoring orientations;
+    # the 0/90/180/270 class is still obvious at this size
+    DETECTION_MAX_SIDE = 600
+
+    # Clockwise correction angle -> lossless PIL transpose (PIL turns counter-clockwise)
+    TRANSPOSE_FOR_ANGLE = {
+        90: Image.Transpose.ROTATE_270,
+        180: Image.Transpose.ROTATE_180,
+        270: Image.Transpose.ROTATE_90,
+    }
+
     def __init__(self):
         pass
 
@@ -40,12 +51,16 @@ class RotationDetector:
         else:
             gray = image_np
 
+        # Downsample before edge/line detection, whose cost grows with pixel count
+        scale = self.DETECTION_MAX_SIDE / max(gray.shape)
+        if scale < 1:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            scale = 1.0
+
         # Calculate scores for all orientations
-        scores = {}
-        for rotation in [0, 90, 180, 270]:
-            rotated = self._rotate_image(gray, rotation)
-            score = self._calculate_orientation_score(rotated)
-            scores[rotation] = score
+        scores = self._calculate_orientation_scores(gray, scale)
+        for rotation, score in scores.items():
             logger.debug(f"Rotation {rotation}: score {score:.4f}")
 
         # Find best rotation
@@ -67,27 +82,28 @@ class RotationDetector:
         logger.info(f"Detected rotation: {best_rotation}° (score: {best_score:.4f}, 0° score: {zero_score:.4f})")
         return best_rotation
 
-    def _rotate_image(self, image, angle):
-        """Rotate image by specified angle"""
-        if angle == 0:
-            return image
-        elif angle == 90:
-            return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
-        elif angle == 180:
-            return cv2.rotate(image, cv2.ROTATE_180)
-        elif angle == 270:
-            return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
-        return image
-
-    def _calculate_orientation_score(self, gray_image):
+    def _calculate_orientation_scores(self, gray_image, scale=1.0):
         """
-        Calculate a score for the current orientation.
+        Calculate a score for each orientation (0/90/180/270).
         Higher score indicates more likely to be correctly oriented.
 
         Uses multiple heuristics:
         1. Text line detection (horizontal lines indicate correct orientation)
         2. Edge density in horizontal vs vertical direction
         3. Variance of projections
+
+        Edges, projections and lines are computed once on the unrotated page:
+        a quarter turn swaps the row and column projections and turns vertical
+        lines into horizontal ones, while a half turn leaves all three
+        unchanged, so no rotated copies are needed.
+
+        Args:
+            gray_image: Grayscale image as numpy array
+            scale: Factor the page was downsampled by; line-length thresholds
+                   are given in full-resolution pixels and scaled to match
+
+        Returns:
+            dict: Score per rotation angle
         """
         # Apply edge detection
         edges = cv2.Canny(gray_image, 50, 150)
@@ -101,38 +117,45 @@ class RotationDetector:
         h_variance = np.var(h_projection)
         v_variance = np.var(v_projection)
 
-        # Text documents typically have more horizontal structure
-        # Calculate the ratio of horizontal to vertical variance
-        if v_variance > 0:
-            variance_ratio = h_variance / v_variance
-        else:
-            variance_ratio = h_variance
-
         # Apply Hough Line Transform to detect lines
+        min_line_length = max(1, round(100 * scale))
         lines = cv2.HoughLinesP(
             edges,
             rho=1,
             theta=np.pi / 180,
-            threshold=100,
-            minLineLength=100,
-            maxLineGap=10
+            threshold=min_line_length,
+            minLineLength=min_line_length,
+            maxLineGap=max(1, round(10 * scale))
         )
 
-        # Count horizontal lines (lines with small angle from horizontal)
+        # Count horizontal and vertical lines (within 15 degrees of the axis)
         horizontal_lines = 0
+        vertical_lines = 0
         if lines is not None:
-            for line in lines:
-                x1, y1, x2, y2 = line[0]
+            for x1, y1, x2, y2 in lines.reshape(-1, 4):
                 angle = abs(np.arctan2(y2 - y1, x2 - x1) * 180 / np.pi)
-                # Consider lines within 15 degrees of horizontal
                 if angle < 15 or angle > 165:
                     horizontal_lines += 1
+                elif 75 < angle < 105:
+                    vertical_lines += 1
 
         # Combine scores (weighted)
         # More horizontal lines and higher h/v variance ratio indicate better orientation
-        score = (variance_ratio * 0.6) + (horizontal_lines * 0.4)
+        upright_score = self._combine_scores(h_variance, v_variance, horizontal_lines)
+        sideways_score = self._combine_scores(v_variance, h_variance, vertical_lines)
+
+        return {0: upright_score, 90: sideways_score, 180: upright_score, 270: sideways_score}
+
+    def _combine_scores(self, h_variance, v_variance, horizontal_lines):
+        """Weight the projection variance ratio and horizontal line count"""
+        # Text documents typically have more horizontal structure
+        # Calculate the ratio of horizontal to vertical variance
+        if v_variance > 0:
+            variance_ratio = h_variance / v_variance
+        else:
+            variance_ratio = h_variance
 
-        return score
+        return (variance_ratio * 0.6) + (horizontal_lines * 0.4)
 
     def apply_rotation(self, image, angle):
         """
@@ -149,16 +172,12 @@ class RotationDetector:
         if isinstance(image, np.ndarray):
             image = Image.fromarray(image)
 
-        if angle == 0:
+        # Quarter turns are pure pixel reordering, so transpose instead of
+        # going through the general affine rotate
+        transpose = self.TRANSPOSE_FOR_ANGLE.get(angle)
+        if transpose is None:
             return image
-        elif angle == 90:
-            return image.rotate(-90, expand=True)
-        elif angle == 180:
-            return image.rotate(-180, expand=True)
-        elif angle == 270:
-            return image.rotate(-270, expand=True)
-
-        return image
+        return image.transpose(transpose)
 
     def detect_and_correct(self, image):
         """
@@ -173,3 +192,7 @@ class RotationDetector:
         angle = self.detect_rotation(image)
         corrected = self.apply_rotation(image, angle)
         return corrected, angle
+
+
+# Singleton instance
+rotation_detector = RotationDetector()
@@ -0,0 +1,33 @@
+"""
+Celery tasks for document processing.
+"""
+import logging
+from celery import shared_task
+
+from .models import Document
+from .services import get_document_processor
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def process_document_task(document_id: int) -> bool:
+    """
+    Process a document in a Celery worker.
+
+    Cancellation still works across processes: the processor re-reads the
+    document status from the database between pages and before each AI call.
+
+    Args:
+        document_id: ID of the document to process
+
+    Returns:
+        bool: True if processing succeeded
+    """
+    try:
+        document = Document.objects.get(pk=document_id)
+    except Document.DoesNotExist:
+        logger.warning("Document %s was deleted before processing started", document_id)
+        return False
+
+    return get_document_processor().process_document(document)
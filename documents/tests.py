@@ -1,3 +1,543 @@
-from django.test import TestCase
+"""
+Tests for the documents app.
+"""
+import asyncio
+import io
+import json
+import tempfile
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+import orjson
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import views
+from .exports import iter_json_export, store_exports
+from .middleware import TextGZipMiddleware
+from .services import cancellation_manager
+from .services.ai_extractor import AIExtractor
+from .models import Document, Page, ContentBlock, TableCell, FormField
+from .serializers import DocumentSerializer, PageSerializer, stream_document
+
+
+def create_document(**kwargs):
+    """A document with out-of-order pages, blocks, cells and fields, and an empty page"""
+    document = Document.objects.create(
+        title='Invoice "2024"',
+        original_filename='invoice.pdf',
+        file='documents/invoice.pdf',
+        file_type='pdf',
+        file_size=2048,
+        status='completed',
+        total_pages=3,
+        **kwargs
+    )
+    second = Page.objects.create(
+        document=document, page_number=2, image='pages/page_2.jpg', width=1240, height=1754,
+        detected_language='bn+en', language_confidence=0.75, page_type='mixed', processed=True
+    )
+    Page.objects.create(document=document, page_number=3, width=1240, height=1754)
+    first = Page.objects.create(
+        document=document, page_number=1, image='pages/page_1.jpg', width=1240, height=1754,
+        detected_language='en', language_confidence=0.98, page_type='form', processed=True
+    )
+
+    bbox = {'bbox_x1': 0.1, 'bbox_y1': 0.2, 'bbox_x2': 0.9, 'bbox_y2': 0.4}
+    table = ContentBlock.objects.create(
+        page=second, block_number=2, block_type='table', text_content='Qty\tTotal',
+        confidence=0.82, requires_review=True, metadata={'source': 'ai'},
+        table_data={'headers': [{'text': 'Qty', 'column_path': [0]}], 'rows': []}, **bbox
+    )
+    ContentBlock.objects.create(
+        page=second, block_number=1, block_type='paragraph',
+        text_content='Line one\nLine two — বাংলা', **bbox
+    )
+    form = ContentBlock.objects.create(
+        page=first, block_number=1, block_type='form', text_content='Name: Bob',
+        is_handwritten=True, form_data={'fields': [{'field_name': 'name'}]}, **bbox
+    )
+
+    TableCell.objects.create(content_block=table, row_index=1, column_path=[1], text='9.50', value=9.5)
+    TableCell.objects.create(content_block=table, row_index=0, column_path=[1], text='Total', is_header=True)
+    TableCell.objects.create(content_block=table, row_index=0, column_path=[0], text='Qty', is_header=True)
+    TableCell.objects.create(content_block=table, row_index=1, column_path=[0], text='2', rowspan=2)
+
+    FormField.objects.create(
+        content_block=form, field_name='signed', field_type='checkbox', field_order=2, confidence=0.6
+    )
+    FormField.objects.create(
+        content_block=form, field_name='name', field_label='Name', field_type='text',
+        field_value='Bob', is_filled=True, field_order=1, metadata={'line': 1}
+    )
+    return document
+
+
+class StreamDocumentTests(TestCase):
+    """stream_document() against the nested DocumentSerializer -> PageSerializer output"""
+
+    def assert_matches_nested(self, document, request=None):
+        context = {'request': request}
+        expected = dict(DocumentSerializer(document, context={**context, 'include_pages': False}).data)
+        expected['pages'] = PageSerializer(document.pages.all(), many=True, context=context).data
+
+        self.assertEqual(b''.join(stream_document(document, request)), orjson.dumps(expected))
+
+    def test_matches_nested_serializers(self):
+        self.assert_matches_nested(create_document())
+
+    def test_matches_nested_serializers_with_request(self):
+        # Image URLs are absolute when there is a request
+        self.assert_matches_nested(create_document(), APIRequestFactory().get('/api/documents/'))
+
+    def test_document_without_pages(self):
+        document = Document.objects.create(
+            title='Empty', original_filename='empty.pdf', file='documents/empty.pdf',
+            file_type='pdf', file_size=1
+        )
+        self.assert_matches_nested(document)
+
+    def test_get_pages_matches_nested_serializers(self):
+        document = create_document()
+        self.assertEqual(
+            orjson.dumps(DocumentSerializer(document).data['pages']),
+            orjson.dumps(PageSerializer(document.pages.all(), many=True).data)
+        )
+
+
+class JsonExportTests(TestCase):
+    """iter_json_export() against dumping the whole export with OPT_INDENT_2"""
+
+    def expected_export(self, document):
+        data = {
+            'document': {
+                'title': document.title,
+                'status': document.status,
+                'total_pages': document.total_pages,
+            },
+            'pages': [
+                {
+                    'page_number': page.page_number,
+                    'language': page.detected_language,
+                    'page_type': page.page_type,
+                    'content_blocks': [
+                        {
+                            'block_number': block.block_number,
+                            'block_type': block.block_type,
+                            'text_content': block.text_content,
+                            'confidence': block.confidence,
+                            'table_data': block.table_data,
+                            'form_data': block.form_data
+                        }
+                        for block in page.content_blocks.all()
+                    ]
+                }
+                for page in document.pages.all()
+            ]
+        }
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+
+    def test_matches_whole_document_dump(self):
+        document = create_document()
+        self.assertEqual(b''.join(iter_json_export(document)), self.expected_export(document))
+
+    def test_document_without_pages(self):
+        document = Document.objects.create(
+            title='Empty', original_filename='empty.pdf', file='documents/empty.pdf',
+            file_type='pdf', file_size=1
+        )
+        self.assertEqual(b''.join(iter_json_export(document)), self.expected_export(document))
+
+
+class TextGZipMiddlewareTests(SimpleTestCase):
+    """Only text responses are gzipped"""
+
+    def get_response(self, content_type):
+        middleware = TextGZipMiddleware(lambda request: HttpResponse(b'a,b,c\n' * 100, content_type=content_type))
+        return middleware(RequestFactory().get('/', headers={'accept-encoding': 'gzip'}))
+
+    def test_compresses_text(self):
+        for content_type in ('text/csv', 'text/plain; charset=utf-8', 'application/json'):
+            with self.subTest(content_type=content_type):
+                self.assertEqual(self.get_response(content_type).get('Content-Encoding'), 'gzip')
+
+    def test_skips_compressed_formats(self):
+        for content_type in (
+            'application/pdf', 'image/jpeg',
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        ):
+            with self.subTest(content_type=content_type):
+                response = self.get_response(content_type)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(response.content, b'a,b,c\n' * 100)
+
+
+PAGE_DATA = {
+    'page_type': 'text',
+    'detected_language': 'en',
+    'language_confidence': 0.9,
+    'content_blocks': [],
+}
+
+
+def fake_completion(content, n=1):
+    """A chat completion response carrying the given JSON content n times"""
+    message = SimpleNamespace(content=json.dumps(content))
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=message) for _ in range(n)],
+        usage=SimpleNamespace(total_tokens=40)
+    )
+
+
+def page_image(seed):
+    """A non-blank page image whose JPEG bytes differ per seed"""
+    image = Image.new('L', (64, 64), 255)
+    image.paste(0, (seed, seed, seed + 20, seed + 8))
+    return image
+
+
+class FakeAsyncClient:
+    """AsyncOpenAI stand-in recording how many images each request carries"""
+
+    def __init__(self):
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **request):
+        images = len(request['messages'][0]['content']) - 1
+        self.calls.append(images)
+        if images == 1:
+            return fake_completion(PAGE_DATA)
+        return fake_completion({'pages': [PAGE_DATA] * images})
+
+
+class MultiPageExtractionTests(SimpleTestCase):
+    """extract_multiple_pages() skips blank and cached pages like single-page extraction"""
+
+    def setUp(self):
+        cache.clear()
+        self.extractor = AIExtractor(api_key='test', model='test-model')
+        self.client = FakeAsyncClient()
+
+    def extract(self, images):
+        return asyncio.run(self.extractor.extract_multiple_pages(images, max_per_call=4, client=self.client))
+
+    def test_blank_and_cached_pages_are_left_out_of_the_request(self):
+        cached_page = page_image(0)
+        self.extract([cached_page])
+        self.client.calls.clear()
+
+        blank_page = Image.new('L', (64, 64), 255)
+        results = self.extract([blank_page, cached_page, page_image(10), page_image(20)])
+
+        self.assertEqual(self.client.calls, [2])
+        self.assertTrue(results[0]['blank'])
+        self.assertTrue(results[1]['cached'])
+        self.assertEqual([result['data'] for result in results[1:]], [PAGE_DATA] * 3)
+
+    def test_group_results_are_cached_per_page(self):
+        images = [page_image(0), page_image(10), page_image(20)]
+        self.extract(images)
+        self.assertEqual(self.client.calls, [3])
+
+        results = self.extract(images)
+        self.assertEqual(self.client.calls, [3])
+        self.assertTrue(all(result['cached'] for result in results))
+
+    def test_single_remaining_page_uses_single_page_request(self):
+        blank_page = Image.new('L', (64, 64), 255)
+        results = self.extract([blank_page, page_image(0)])
+
+        self.assertEqual(self.client.calls, [1])
+        self.assertTrue(results[1]['success'])
+
+
+class FakeClient:
+    """OpenAI stand-in returning n candidate extractions per request"""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **request):
+        self.calls += 1
+        return fake_completion(PAGE_DATA, request.get('n', 1))
+
+
+class SampledExtractionCacheTests(SimpleTestCase):
+    """Cache hits return the same result shape as the call that filled the cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.extractor = AIExtractor(api_key='test', model='test-model')
+        self.extractor.client = FakeClient()
+
+    def test_cache_hit_keeps_samples(self):
+        first = self.extractor.extract_page_content(page_image(0), n_samples=3)
+        second = self.extractor.extract_page_content(page_image(0), n_samples=3)
+
+        self.assertEqual(self.extractor.client.calls, 1)
+        self.assertTrue(second['cached'])
+        self.assertEqual(second['data'], first['data'])
+        self.assertEqual(second['samples'], [PAGE_DATA] * 3)
+
+    def test_entry_without_samples_is_a_miss(self):
+        image = page_image(0)
+        self.extractor.extract_page_content(image, n_samples=3)
+        key = self.extractor._cache_key(
+            self.extractor._image_to_jpeg(image), self.extractor._choose_detail(image), 3
+        )
+        entry = cache.get(key)
+        del entry['samples']
+        cache.set(key, entry)
+
+        result = self.extractor.extract_page_content(image, n_samples=3)
+        self.assertEqual(self.extractor.client.calls, 2)
+        self.assertEqual(len(result['samples']), 3)
+
+
+class SearchTests(TestCase):
+    """Cursor-paginated block search"""
+
+    def setUp(self):
+        self.document = create_document()
+        page = self.document.pages.get(page_number=3)
+        bbox = {'bbox_x1': 0, 'bbox_y1': 0, 'bbox_x2': 1, 'bbox_y2': 1}
+        self.blocks = [
+            ContentBlock.objects.create(
+                page=page, block_number=number, block_type='heading' if number % 2 else 'paragraph',
+                text_content=f'Alpha item {number}', **bbox
+            )
+            for number in range(1, 6)
+        ]
+        self.client = APIClient()
+
+    def search(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_pages_cover_every_match_once(self):
+        data = self.search('/api/documents/search/?q=alpha&limit=2')
+        self.assertIsNone(data['previous'])
+        ids = []
+        while True:
+            self.assertEqual(data['count'], len(data['results']))
+            ids += [result['block_id'] for result in data['results']]
+            if not data['next']:
+                break
+            data = self.search(data['next'])
+
+        self.assertEqual(ids, sorted((block.id for block in self.blocks), reverse=True))
+
+    def test_filters_combine(self):
+        data = self.search(f'/api/documents/search/?q=alpha&block_type=heading&document_id={self.document.id}')
+        self.assertEqual(
+            [result['block_id'] for result in data['results']],
+            [block.id for block in reversed(self.blocks) if block.block_type == 'heading']
+        )
+        self.assertEqual(data['results'][0]['document_title'], self.document.title)
+        self.assertEqual(data['results'][0]['page_number'], 3)
+
+        data = self.search('/api/documents/search/?q=alpha&language=en')
+        self.assertEqual(data['results'], [])
+
+    def test_snippet_is_truncated(self):
+        self.blocks[0].text_content = 'alpha ' + 'x' * 1000
+        self.blocks[0].save()
+        data = self.search('/api/documents/search/?q=alpha&block_type=heading&limit=10')
+        self.assertEqual(len(data['results'][-1]['text_content']), 500)
+
+
+class ExportInvalidationTests(TestCase):
+    """Stored and cached exports follow the document title"""
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.document = create_document(processed_at=timezone.now())
+        self.client = APIClient()
+
+    def rename(self, title):
+        response = self.client.patch(f'/api/documents/{self.document.id}/', {'title': title}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.document.refresh_from_db()
+
+    def test_cached_export_renders_once(self):
+        render = mock.Mock(return_value=HttpResponse(b'export', content_type='text/plain'))
+        render.return_value['Content-Disposition'] = 'attachment; filename="a.txt"'
+
+        for _ in range(2):
+            response = views.cached_export('export:test', render)
+            self.assertEqual(response.content, b'export')
+            self.assertEqual(response['Content-Disposition'], 'attachment; filename="a.txt"')
+        render.assert_called_once()
+
+    def test_cached_export_skips_errors_and_unkeyed(self):
+        failing = mock.Mock(return_value=HttpResponse(status=404))
+        views.cached_export('export:test', failing)
+        views.cached_export('export:test', failing)
+        self.assertEqual(failing.call_count, 2)
+
+        render = mock.Mock(return_value=HttpResponse(b'export'))
+        views.cached_export(None, render)
+        views.cached_export(None, render)
+        self.assertEqual(render.call_count, 2)
+
+    def test_export_cache_key_only_for_completed_documents(self):
+        self.assertIsNotNone(views.export_cache_key(self.document, 'download', 'docx'))
+        self.document.status = 'processing'
+        self.assertIsNone(views.export_cache_key(self.document, 'download', 'docx'))
+
+    def test_rename_clears_stored_exports(self):
+        store_exports(self.document)
+        stored = [self.document.txt_export, self.document.csv_export, self.document.json_export]
+        storage = stored[0].storage
+        names = [field.name for field in stored]
+        self.assertTrue(all(storage.exists(name) for name in names))
+
+        self.rename('Renamed')
+
+        self.assertFalse(self.document.txt_export)
+        self.assertFalse(self.document.csv_export)
+        self.assertFalse(self.document.json_export)
+        self.assertFalse(any(storage.exists(name) for name in names))
+
+    def test_unchanged_title_keeps_stored_exports(self):
+        store_exports(self.document)
+        name = self.document.txt_export.name
+
+        self.rename(self.document.title)
+
+        self.assertEqual(self.document.txt_export.name, name)
+
+    def test_rename_misses_cached_block_export(self):
+        block = ContentBlock.objects.get(page__document=self.document, block_type='form')
+        url = f'/api/blocks/{block.id}/export/?export_format=json'
+
+        response = self.client.get(url)
+        self.assertIn('Invoice', response['Content-Disposition'])
+        self.assertEqual(orjson.loads(response.content)['document_title'], 'Invoice "2024"')
+
+        self.rename('Renamed')
+
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="Renamed_Page1_Block1.json"')
+        self.assertEqual(orjson.loads(response.content)['document_title'], 'Renamed')
+
+
+def create_documents(*statuses):
+    """One page-less document per status"""
+    return [
+        Document.objects.create(
+            title=f'{status} {index}', original_filename='scan.pdf', file='documents/scan.pdf',
+            file_type='pdf', file_size=1, status=status, error_message='boom' if status == 'failed' else None
+        )
+        for index, status in enumerate(statuses)
+    ]
+
+
+class ForceCancelAllTests(TestCase):
+    """force_cancel_all.py cancels every processing document in one update"""
+
+    def test_cancels_only_processing_documents(self):
+        import force_cancel_all
+
+        processing, other, completed = create_documents('processing', 'processing', 'completed')
+
+        with redirect_stdout(io.StringIO()), self.assertNumQueries(2):
+            force_cancel_all.force_cancel_all()
+
+        for document in (processing, other):
+            document.refresh_from_db()
+            self.assertEqual(document.status, 'cancelled')
+            self.assertEqual(document.error_message, 'Force cancelled by administrator')
+            self.assertFalse(cancellation_manager.is_cancelled(document.id))
+        completed.refresh_from_db()
+        self.assertEqual(completed.status, 'completed')
+
+    def test_nothing_processing(self):
+        import force_cancel_all
+
+        create_documents('completed')
+        with redirect_stdout(io.StringIO()) as output:
+            force_cancel_all.force_cancel_all()
+        self.assertIn('No documents are currently processing', output.getvalue())
+
+
+class ReprocessFailedTests(TestCase):
+    """reprocess_failed.py resets failed documents in bulk, then processes them"""
+
+    def test_resets_and_reprocesses_failed_documents(self):
+        import reprocess_failed
+
+        failed, other_failed, completed = create_documents('failed', 'failed', 'completed')
+        for document in (failed, completed):
+            Page.objects.create(document=document, page_number=1, width=10, height=10)
+
+        seen = {}
+        processor = mock.Mock()
+        processor.process_document.side_effect = lambda doc: seen.setdefault(doc.id, doc.status) == 'uploaded'
+
+        with mock.patch.object(reprocess_failed, 'get_document_processor', return_value=processor), \
+                redirect_stdout(io.StringIO()):
+            reprocess_failed.reprocess_failed_documents()
+
+        # Documents reach the processor already reset
+        self.assertEqual(seen, {failed.id: 'uploaded', other_failed.id: 'uploaded'})
+        for document in (failed, other_failed):
+            document.refresh_from_db()
+            self.assertEqual(document.status, 'uploaded')
+            self.assertIsNone(document.error_message)
+        self.assertFalse(Page.objects.filter(document=failed).exists())
+        self.assertTrue(Page.objects.filter(document=completed).exists())
+
+
+@skipUnless(views.HAS_REPORTLAB, 'reportlab not installed')
+class BlockPdfTableTests(TestCase):
+    """Long block tables are laid out as several tables that repeat the header"""
+
+    def render_pdf(self, row_count):
+        page = create_document().pages.get(page_number=3)
+        block = ContentBlock.objects.create(
+            page=page, block_number=1, block_type='table', text_content='table',
+            bbox_x1=0, bbox_y1=0, bbox_x2=1, bbox_y2=1,
+            table_data={
+                'headers': [{'text': 'N'}, {'text': 'Square'}],
+                'rows': [
+                    {'row_index': index, 'cells': [{'text': str(index)}, {'text': str(index * index)}]}
+                    for index in range(row_count)
+                ],
+            }
+        )
+        with mock.patch.object(views, 'Table', wraps=views.Table) as table:
+            response = views.ContentBlockViewSet()._render_block(block, 'pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        return [call.args[0] for call in table.call_args_list]
+
+    def test_short_table_is_one_table(self):
+        tables = self.render_pdf(views.PDF_TABLE_SPLIT_ROWS - 1)
+        self.assertEqual(len(tables), 1)
+        self.assertEqual(len(tables[0]), views.PDF_TABLE_SPLIT_ROWS)
+
+    def test_long_table_is_chunked(self):
+        row_count = 2 * views.PDF_TABLE_CHUNK_ROWS + views.PDF_TABLE_SPLIT_ROWS
+        tables = self.render_pdf(row_count)
+
+        self.assertEqual(len(tables), -(-row_count // views.PDF_TABLE_CHUNK_ROWS))
+        self.assertTrue(all(table[0] == ['N', 'Square'] for table in tables))
+        self.assertTrue(all(len(table) <= views.PDF_TABLE_CHUNK_ROWS + 1 for table in tables))
+        rows = [row for table in tables for row in table[1:]]
+        self.assertEqual(rows, [[str(index), str(index * index)] for index in range(row_count)])
 
-# Create your tests here.
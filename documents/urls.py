@@ -21,6 +21,7 @@ urlpatterns = [
     path('viewer/<int:document_id>/', views.document_viewer, name='viewer'),
 
     # API endpoints
+    path('api/documents/<int:document_id>/status/', views.document_status, name='document-status'),
     path('api/', include(router.urls)),
 
     # Direct URL for block downloads
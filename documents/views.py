@@ -1,29 +1,238 @@
 """
 REST API Views for document processing.
 """
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.cache import cache
+from django.db import connection
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Q
-from django.http import HttpResponse, FileResponse
+from django.db.models import F, FloatField, Q, Prefetch
+from django.db.models.functions import Cast, Left
+from django.http import HttpResponse, FileResponse, StreamingHttpResponse, JsonResponse
+from django.utils.http import content_disposition_header
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+import hashlib
 import threading
 import logging
-import json
-import csv
-from io import StringIO, BytesIO
-
+import mimetypes
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from itertools import chain, zip_longest
+from typing import Callable, Dict, Optional
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+from zipfile import ZIP_DEFLATED, ZipFile
+import orjson
+
+# Export formats backed by optional packages
+try:
+    from docx import Document as DocxDocument
+    HAS_DOCX = True
+except ImportError:
+    HAS_DOCX = False
+
+try:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
+    from openpyxl.writer.excel import ExcelWriter
+    HAS_OPENPYXL = True
+except ImportError:
+    HAS_OPENPYXL = False
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter, A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    HAS_REPORTLAB = True
+except ImportError:
+    HAS_REPORTLAB = False
+
+if HAS_REPORTLAB:
+    # Built once and shared by every PDF export; layout only reads them
+    PDF_STYLES = getSampleStyleSheet()
+    TABLES_PDF_STYLE = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+    BLOCK_PDF_TABLE_STYLE = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+        ('TOPPADDING', (0, 0), (-1, 0), 10),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        # Alternate row colors
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#E7E6E6')]),
+    ])
+
+from .exports import (
+    EXPORT_FILE_FIELDS, TEXT_EXPORTS, block_table_rows, clear_exports, export_pages,
+    iter_block_csv, iter_table_blocks, iter_table_rows, iter_tables_csv
+)
 from .models import Document, Page, ContentBlock, ExtractionLog
 from .serializers import (
     DocumentSerializer, DocumentListSerializer, DocumentUploadSerializer,
     PageSerializer, PageListSerializer, ContentBlockSerializer,
-    ExtractionLogSerializer, SearchResultSerializer
+    ExtractionLogSerializer, iter_page_payloads, stream_document
 )
-from .services import DocumentProcessor
+from .services import cancellation_manager, get_document_processor
 
 logger = logging.getLogger(__name__)
 
+# In-process fallback when Celery is not configured: at most DOCUMENT_WORKERS
+# documents run at once, the rest wait their turn in FIFO order
+_processing_pool = ThreadPoolExecutor(
+    max_workers=settings.DOCUMENT_WORKERS, thread_name_prefix='document-processing'
+)
+_pending: Dict[int, Future] = {}
+_pending_lock = threading.Lock()
+
+
+def start_processing(document: Document):
+    """
+    Process a document outside the request cycle.
+
+    Hands the document to a Celery worker when a broker is configured, so
+    web workers never block on model inference; otherwise queues it on a
+    bounded thread pool in this process.
+    """
+    if settings.CELERY_BROKER_URL:
+        from .tasks import process_document_task
+        process_document_task.delay(document.id)
+        return
+
+    processor = get_document_processor()
+    future = _processing_pool.submit(processor.process_document, document)
+    with _pending_lock:
+        _pending[document.id] = future
+    future.add_done_callback(lambda f: _forget_pending(document.id, f))
+
+
+def _forget_pending(document_id: int, future: Future):
+    with _pending_lock:
+        if _pending.get(document_id) is future:
+            del _pending[document_id]
+
+
+def cancel_queued_processing(document_id: int) -> bool:
+    """
+    Drop a document that is still waiting for a processing thread.
+
+    Returns True if it was removed from the queue before it started.
+    """
+    with _pending_lock:
+        future = _pending.get(document_id)
+    return future is not None and future.cancel()
+
+
+def serve_file(field_file, filename: str, content_type: Optional[str] = None) -> HttpResponse:
+    """
+    Attachment response for a stored file.
+
+    With MEDIA_ACCEL_REDIRECT_PREFIX set, only headers are returned and
+    Nginx sends the bytes from its internal location; otherwise the file is
+    streamed from storage.
+    """
+    prefix = settings.MEDIA_ACCEL_REDIRECT_PREFIX
+    if not prefix:
+        return FileResponse(field_file.open('rb'), as_attachment=True, filename=filename, content_type=content_type)
+
+    content_type = content_type or mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream'
+    response = HttpResponse(content_type=content_type)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(field_file.name)
+    return response
+
+
+def workbook_bytes(wb) -> bytes:
+    """
+    Serialize an openpyxl workbook, as wb.save() would, at zip compression level 1.
+
+    DEFLATE dominates saving large sheets; level 1 is several times faster
+    than the default for files only slightly larger.
+    """
+    if wb.write_only and not wb.worksheets:
+        wb.create_sheet()
+    buffer = BytesIO()
+    archive = ZipFile(buffer, 'w', ZIP_DEFLATED, allowZip64=True, compresslevel=1)
+    ExcelWriter(wb, archive).save()  # Closes the archive
+    return buffer.getvalue()
+
+
+def export_cache_key(document: Document, *parts) -> Optional[str]:
+    """
+    Cache key for a rendered export, or None while the document can still change.
+
+    Only completed documents are cached. processed_at moves on every
+    (re)processing run and the title (embedded in headings and filenames)
+    is hashed in, so entries for older results or an old title are never
+    read again and simply expire.
+    """
+    if document.status != 'completed' or document.processed_at is None:
+        return None
+    title = hashlib.blake2b(document.title.encode('utf-8'), digest_size=8).hexdigest()
+    suffix = ':'.join(str(part) for part in parts)
+    return f"export:{document.id}:{document.processed_at.timestamp()}:{title}:{suffix}"
+
+
+def cached_export(key: Optional[str], render: Callable[[], HttpResponse]) -> HttpResponse:
+    """Serve a rendered export from the cache, rendering and storing it on a miss"""
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type, disposition = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['Content-Disposition'] = disposition
+            return response
+
+    response = render()
+    # Error responses (missing libraries, no tables, ...) are not cached
+    if key is not None and response.status_code == 200 and not response.streaming:
+        cache.set(
+            key,
+            (response.content, response['Content-Type'], response['Content-Disposition']),
+            timeout=settings.EXPORT_CACHE_TIMEOUT,
+        )
+    return response
+
+
+# Block tables longer than PDF_TABLE_SPLIT_ROWS are rendered as tables of
+# PDF_TABLE_CHUNK_ROWS rows each (see ContentBlockViewSet._render_block)
+PDF_TABLE_SPLIT_ROWS = 500
+PDF_TABLE_CHUNK_ROWS = 200
+
+
+class SearchResultPagination(CursorPagination):
+    """Cursor pages over search results; the view sets the ordering per query"""
+    page_size = 100
+    page_size_query_param = 'limit'
+    max_page_size = 500
+    ordering = '-id'
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': len(data),
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
 
 class DocumentViewSet(viewsets.ModelViewSet):
     """
@@ -44,56 +253,59 @@ class DocumentViewSet(viewsets.ModelViewSet):
         """List all documents with processing status info"""
         response = super().list(request, *args, **kwargs)
 
-        # Show which documents are currently processing
-        processing_docs = Document.objects.filter(status='processing')
-        if processing_docs.exists():
-            doc_info = ', '.join([f"#{doc.id}({doc.title})" for doc in processing_docs])
-            print(f"⏳ Currently processing: {doc_info}")
+        # Show which documents are currently processing (skips the query unless debugging)
+        if logger.isEnabledFor(logging.DEBUG):
+            processing_ids = list(Document.objects.filter(status='processing').values_list('id', flat=True))
+            if processing_ids:
+                logger.debug("Currently processing documents: %s", processing_ids)
 
         return response
 
-    def create(self, request, *args, **kwargs):
-        """Upload and process a document"""
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+    def retrieve(self, request, *args, **kwargs):
+        """Stream full document JSON page by page (browsable API renders normally)"""
+        if request.accepted_renderer.format != 'json':
+            return super().retrieve(request, *args, **kwargs)
+
+        document = self.get_object()
+        return StreamingHttpResponse(
+            stream_document(document, request),
+            content_type='application/json'
+        )
+
+    def perform_create(self, serializer):
+        """Save an uploaded document and start processing it"""
         document = serializer.save()
 
-        print(f"\n{'='*80}")
-        print(f"📤 UPLOAD RECEIVED: Document #{document.id} - '{document.title}'")
-        print(f"   File: {document.original_filename}")
-        print(f"   Size: {document.file.size / 1024:.2f} KB")
-        print(f"   Type: {document.file_type}")
-        print(f"   Starting background processing...")
-        print(f"{'='*80}\n")
+        logger.info(
+            "Upload received: document #%s %r (%s, %.2f KB, %s)",
+            document.id, document.title, document.original_filename,
+            document.file_size / 1024, document.file_type
+        )
 
         # Start processing in background
-        processor = DocumentProcessor()
-        thread = threading.Thread(
-            target=processor.process_document,
-            args=(document,)
-        )
-        thread.daemon = True
-        thread.start()
-
-        # Return document info
-        response_serializer = DocumentListSerializer(document)
-        return Response(
-            response_serializer.data,
-            status=status.HTTP_201_CREATED
-        )
+        start_processing(document)
+
+    def perform_update(self, serializer):
+        """Save edits; stored exports embed the title, so drop them when it changes"""
+        old_title = serializer.instance.title
+        document = serializer.save()
+        if document.title != old_title:
+            clear_exports(document)
+            document.save(update_fields=EXPORT_FILE_FIELDS)
 
     @action(detail=True, methods=['post'])
     def reprocess(self, request, pk=None):
         """Reprocess a document"""
         document = self.get_object()
 
-        print(f"\n{'='*80}")
-        print(f"🔄 REPROCESS REQUEST: Document #{document.id} - '{document.title}'")
-        print(f"   Previous status: {document.status}")
-        print(f"{'='*80}\n")
+        logger.info(
+            "Reprocess requested: document #%s %r (previous status: %s)",
+            document.id, document.title, document.status
+        )
 
-        # Delete existing pages and content
+        # Delete existing pages, content and stored exports
         document.pages.all().delete()
+        clear_exports(document)
 
         # Reset document status
         document.status = 'uploaded'
@@ -101,13 +313,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
         document.save()
 
         # Start processing
-        processor = DocumentProcessor()
-        thread = threading.Thread(
-            target=processor.process_document,
-            args=(document,)
-        )
-        thread.daemon = True
-        thread.start()
+        start_processing(document)
 
         return Response({
             'status': 'processing',
@@ -117,38 +323,35 @@ class DocumentViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """Cancel document processing immediately"""
-        from .services import cancellation_manager
-
         document = self.get_object()
 
-        print(f"\n{'='*60}")
-        print(f"❌ CANCEL REQUEST RECEIVED for document {document.id}")
-        print(f"Current status: {document.status}")
-        print(f"{'='*60}\n")
+        logger.info("Cancel requested: document #%s (status: %s)", document.id, document.status)
+
+        # Documents still queued for a worker thread never start
+        if cancel_queued_processing(document.id):
+            document.status = 'cancelled'
+            document.error_message = 'Processing cancelled by user'
+            document.save(update_fields=['status', 'error_message'])
+            return Response({
+                'status': 'cancelled',
+                'message': 'Document was removed from the processing queue.'
+            })
 
         # Only allow cancellation of processing documents
         if document.status != 'processing':
-            print(f"ERROR: Cannot cancel document with status: {document.status}\n")
             return Response({
                 'error': f'Cannot cancel document with status: {document.status}',
                 'message': 'Only processing documents can be cancelled'
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # Request cancellation
-        print(f"Requesting immediate cancellation for document {document.id}...")
         cancellation_manager.request_cancellation(document.id)
 
         # Immediately update document status to cancelled
         # This will cause IntegrityError in the processing thread, which will be handled gracefully
         document.status = 'cancelled'
         document.error_message = 'Processing cancelled by user'
-        document.save()
-
-        # Verify it was set
-        is_set = cancellation_manager.is_cancelled(document.id)
-        print(f"✓ Cancellation flag set: {is_set}")
-        print(f"✓ Document status updated to: cancelled")
-        print(f"Cancelled docs set: {cancellation_manager._cancelled_docs}\n")
+        document.save(update_fields=['status', 'error_message'])
 
         return Response({
             'status': 'cancelled',
@@ -159,138 +362,75 @@ class DocumentViewSet(viewsets.ModelViewSet):
     def pages(self, request, pk=None):
         """Get all pages for a document"""
         document = self.get_object()
-        pages = document.pages.all()
 
         # Check if we want detailed content
         include_content = request.query_params.get('include_content', 'false').lower() == 'true'
 
         if include_content:
-            serializer = PageSerializer(pages, many=True)
-        else:
-            serializer = PageListSerializer(pages, many=True)
+            # Same payload as PageSerializer, built from flat per-level queries
+            return Response(list(iter_page_payloads(document)))
 
+        pages = document.pages.only('document', *PageListSerializer.Meta.fields)
+        serializer = PageListSerializer(pages, many=True)
         return Response(serializer.data)
 
     @action(detail=True, methods=['get'])
     def download(self, request, pk=None):
         """Download extracted content in various formats"""
-        from django.http import HttpResponse
-        import json
-        import csv
-        from io import StringIO
-
         document = self.get_object()
         format_type = request.query_params.get('format', 'txt')
 
-        # Get all pages and content
-        pages = document.pages.all().prefetch_related('content_blocks')
-
-        if format_type == 'txt':
-            # Plain text format
-            content = f"Document: {document.title}\n"
-            content += f"{'='*60}\n\n"
-
-            for page in pages:
-                content += f"Page {page.page_number}\n"
-                content += f"{'-'*60}\n"
-                for block in page.content_blocks.all():
-                    content += f"{block.text_content}\n\n"
-                content += "\n"
-
-            response = HttpResponse(content, content_type='text/plain')
-            response['Content-Disposition'] = f'attachment; filename="{document.title}.txt"'
-            return response
-
-        elif format_type == 'csv':
-            # CSV format for tables
-            output = StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['Page', 'Block Type', 'Content'])
-
-            for page in pages:
-                for block in page.content_blocks.all():
-                    writer.writerow([page.page_number, block.block_type, block.text_content])
+        if format_type in TEXT_EXPORTS:
+            export, content_type = TEXT_EXPORTS[format_type]
+            # Written when processing completed
+            stored = getattr(document, f'{format_type}_export')
+            if stored:
+                return serve_file(stored, f'{document.title}.{format_type}', content_type)
 
-            response = HttpResponse(output.getvalue(), content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="{document.title}.csv"'
+            # Otherwise stream it page by page instead of building it in memory
+            response = StreamingHttpResponse(export(document), content_type=content_type)
+            response['Content-Disposition'] = f'attachment; filename="{document.title}.{format_type}"'
             return response
 
-        elif format_type == 'json':
-            # JSON format
-            data = {
-                'document': {
-                    'title': document.title,
-                    'status': document.status,
-                    'total_pages': document.total_pages,
-                },
-                'pages': []
-            }
-
-            for page in pages:
-                page_data = {
-                    'page_number': page.page_number,
-                    'language': page.detected_language,
-                    'page_type': page.page_type,
-                    'content_blocks': []
-                }
-
-                for block in page.content_blocks.all():
-                    block_data = {
-                        'block_number': block.block_number,
-                        'block_type': block.block_type,
-                        'text_content': block.text_content,
-                        'confidence': block.confidence,
-                        'table_data': block.table_data,
-                        'form_data': block.form_data
-                    }
-                    page_data['content_blocks'].append(block_data)
-
-                data['pages'].append(page_data)
-
-            response = HttpResponse(json.dumps(data, indent=2), content_type='application/json')
-            response['Content-Disposition'] = f'attachment; filename="{document.title}.json"'
-            return response
+        key = export_cache_key(document, 'download', format_type)
+        return cached_export(key, lambda: self._render_download(document, format_type))
 
-        elif format_type == 'docx':
+    def _render_download(self, document, format_type):
+        """Build the non-streamed download formats"""
+        if format_type == 'docx':
             # Word document format (requires python-docx)
-            try:
-                from docx import Document as DocxDocument
-                from docx.shared import Inches
-
-                doc = DocxDocument()
-                doc.add_heading(document.title, 0)
-
-                for page in pages:
-                    doc.add_heading(f'Page {page.page_number}', level=1)
-                    for block in page.content_blocks.all():
-                        if block.block_type == 'table' and block.table_data:
-                            # Add table
-                            doc.add_paragraph(block.text_content)
-                        else:
-                            doc.add_paragraph(block.text_content)
-
-                # Save to response
-                from io import BytesIO
-                buffer = BytesIO()
-                doc.save(buffer)
-                buffer.seek(0)
-
-                response = HttpResponse(buffer.getvalue(), content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
-                response['Content-Disposition'] = f'attachment; filename="{document.title}.docx"'
-                return response
-            except ImportError:
+            if not HAS_DOCX:
                 return Response({
                     'error': 'python-docx not installed',
                     'message': 'Word document export requires python-docx package'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
+            doc = DocxDocument()
+            doc.add_heading(document.title, 0)
+
+            for page in export_pages(document):
+                doc.add_heading(f'Page {page.page_number}', level=1)
+                for block in page.content_blocks.all():
+                    if block.block_type == 'table' and block.table_data:
+                        # Add table
+                        doc.add_paragraph(block.text_content)
+                    else:
+                        doc.add_paragraph(block.text_content)
+
+            # Save to response
+            buffer = BytesIO()
+            doc.save(buffer)
+            buffer.seek(0)
+
+            response = HttpResponse(buffer.getvalue(), content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+            response['Content-Disposition'] = f'attachment; filename="{document.title}.docx"'
+            return response
+
         return Response({'error': 'Invalid format'}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['get'], url_path='download-original')
     def download_original(self, request, pk=None):
         """Download original uploaded file"""
-        from django.http import FileResponse
-
         document = self.get_object()
 
         if not document.file:
@@ -299,177 +439,116 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 'message': 'Original file is not available'
             }, status=status.HTTP_404_NOT_FOUND)
 
-        response = FileResponse(document.file.open('rb'))
-        response['Content-Disposition'] = f'attachment; filename="{document.original_filename}"'
-        return response
+        return serve_file(document.file, document.original_filename)
 
     @action(detail=True, methods=['get'], url_path='download-tables')
     def download_tables(self, request, pk=None):
         """Download only tables in specified format"""
-        from django.http import HttpResponse
-        import json
-        import csv
-        from io import StringIO, BytesIO
-
         document = self.get_object()
         format_type = request.query_params.get('format', 'xlsx')
 
-        # Get all content blocks that are tables
-        pages = document.pages.all().prefetch_related('content_blocks')
-        table_blocks = []
-        for page in pages:
-            for block in page.content_blocks.filter(block_type='table'):
-                if block.table_data:
-                    table_blocks.append({
-                        'page': page.page_number,
-                        'block': block.block_number,
-                        'data': block.table_data
-                    })
-
-        if not table_blocks:
+        # Tables are still being written; don't export a partial set
+        if document.status == 'processing':
+            return Response({
+                'error': 'Document is still processing',
+                'message': 'Tables can be downloaded once processing has finished'
+            }, status=status.HTTP_409_CONFLICT)
+
+        key = export_cache_key(document, 'tables', format_type)
+        return cached_export(key, lambda: self._render_tables(document, format_type))
+
+    def _render_tables(self, document, format_type):
+        """Build the tables export in the requested format"""
+        # Tables are read a chunk at a time; peek at the first to detect none
+        table_blocks = iter_table_blocks(document)
+        first_table = next(table_blocks, None)
+        if first_table is None:
             return Response({
                 'error': 'No tables found',
                 'message': 'This document does not contain any extracted tables'
             }, status=status.HTTP_404_NOT_FOUND)
 
+        table_blocks = chain([first_table], table_blocks)
+
         if format_type == 'xlsx':
             # Excel format - requires openpyxl
-            try:
-                from openpyxl import Workbook
-                from openpyxl.styles import Font, PatternFill, Alignment
-
-                wb = Workbook()
-                wb.remove(wb.active)  # Remove default sheet
-
-                for idx, table_block in enumerate(table_blocks):
-                    sheet_name = f"Page{table_block['page']}_Table{table_block['block']}"
-                    ws = wb.create_sheet(title=sheet_name[:31])  # Excel limits sheet names to 31 chars
-
-                    # Parse table data and write to Excel
-                    table_data = table_block['data']
-                    if 'cells' in table_data:
-                        # Build table from cells
-                        max_row = max([cell.get('row', 0) for cell in table_data['cells']], default=0) + 1
-                        max_col = max([cell.get('col', 0) for cell in table_data['cells']], default=0) + 1
-
-                        for cell in table_data['cells']:
-                            row = cell.get('row', 0) + 1
-                            col = cell.get('col', 0) + 1
-                            value = cell.get('text', '')
-                            ws.cell(row=row, column=col, value=value)
-
-                            # Style header row
-                            if row == 1:
-                                ws.cell(row=row, column=col).font = Font(bold=True)
-                                ws.cell(row=row, column=col).fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-
-                buffer = BytesIO()
-                wb.save(buffer)
-                buffer.seek(0)
-
-                response = HttpResponse(buffer.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-                response['Content-Disposition'] = f'attachment; filename="{document.title}_tables.xlsx"'
-                return response
-            except ImportError:
+            if not HAS_OPENPYXL:
                 return Response({
                     'error': 'openpyxl not installed',
                     'message': 'Excel export requires openpyxl package'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-        elif format_type == 'csv':
-            # CSV format - one file with all tables
-            output = StringIO()
-            writer = csv.writer(output)
+            # Write-only mode streams rows to the file instead of keeping every cell in memory
+            wb = Workbook(write_only=True)
+            header_font = Font(bold=True)
+            header_fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
 
             for table_block in table_blocks:
-                writer.writerow([f"=== Page {table_block['page']}, Table {table_block['block']} ==="])
-                table_data = table_block['data']
+                sheet_name = f"Page{table_block['page']}_Table{table_block['block']}"
+                ws = wb.create_sheet(title=sheet_name[:31])  # Excel limits sheet names to 31 chars
 
+                # Parse table data and write to Excel
+                table_data = table_block['data']
                 if 'cells' in table_data:
-                    # Build table from cells
-                    max_row = max([cell.get('row', 0) for cell in table_data['cells']], default=0) + 1
-                    max_col = max([cell.get('col', 0) for cell in table_data['cells']], default=0) + 1
-
-                    # Create empty grid
-                    grid = [['' for _ in range(max_col)] for _ in range(max_row)]
-
-                    # Fill grid
-                    for cell in table_data['cells']:
-                        row = cell.get('row', 0)
-                        col = cell.get('col', 0)
-                        grid[row][col] = cell.get('text', '')
-
-                    # Write grid to CSV
-                    for row in grid:
-                        writer.writerow(row)
-
-                writer.writerow([])  # Empty row between tables
+                    rows = iter_table_rows(table_data['cells'], empty=None)
+
+                    # Style header row
+                    header = []
+                    for value in next(rows):
+                        cell = WriteOnlyCell(ws, value=value)
+                        if value is not None:
+                            cell.font = header_font
+                            cell.fill = header_fill
+                        header.append(cell)
+                    ws.append(header)
+
+                    for row in rows:
+                        ws.append(row)
+
+            response = HttpResponse(workbook_bytes(wb), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+            response['Content-Disposition'] = f'attachment; filename="{document.title}_tables.xlsx"'
+            return response
 
-            response = HttpResponse(output.getvalue(), content_type='text/csv')
+        elif format_type == 'csv':
+            # CSV format - one file with all tables, streamed table by table
+            response = StreamingHttpResponse(iter_tables_csv(table_blocks), content_type='text/csv')
             response['Content-Disposition'] = f'attachment; filename="{document.title}_tables.csv"'
             return response
 
         elif format_type == 'pdf':
             # PDF format - requires reportlab
-            try:
-                from reportlab.lib.pagesizes import letter, A4
-                from reportlab.lib import colors
-                from reportlab.lib.styles import getSampleStyleSheet
-                from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-
-                buffer = BytesIO()
-                doc = SimpleDocTemplate(buffer, pagesize=A4)
-                elements = []
-                styles = getSampleStyleSheet()
-
-                for table_block in table_blocks:
-                    # Add heading
-                    heading = Paragraph(f"Page {table_block['page']}, Table {table_block['block']}", styles['Heading2'])
-                    elements.append(heading)
-                    elements.append(Spacer(1, 12))
-
-                    table_data = table_block['data']
-                    if 'cells' in table_data:
-                        # Build table from cells
-                        max_row = max([cell.get('row', 0) for cell in table_data['cells']], default=0) + 1
-                        max_col = max([cell.get('col', 0) for cell in table_data['cells']], default=0) + 1
-
-                        # Create empty grid
-                        grid = [['' for _ in range(max_col)] for _ in range(max_row)]
-
-                        # Fill grid
-                        for cell in table_data['cells']:
-                            row = cell.get('row', 0)
-                            col = cell.get('col', 0)
-                            grid[row][col] = cell.get('text', '')
-
-                        # Create PDF table
-                        pdf_table = Table(grid)
-                        pdf_table.setStyle(TableStyle([
-                            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                            ('FONTSIZE', (0, 0), (-1, 0), 12),
-                            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                        ]))
-                        elements.append(pdf_table)
-                        elements.append(Spacer(1, 20))
-
-                doc.build(elements)
-                buffer.seek(0)
-
-                response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="{document.title}_tables.pdf"'
-                return response
-            except ImportError:
+            if not HAS_REPORTLAB:
                 return Response({
                     'error': 'reportlab not installed',
                     'message': 'PDF export requires reportlab package'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
+            buffer = BytesIO()
+            doc = SimpleDocTemplate(buffer, pagesize=A4)
+            elements = []
+            styles = PDF_STYLES
+
+            for table_block in table_blocks:
+                # Add heading
+                heading = Paragraph(f"Page {table_block['page']}, Table {table_block['block']}", styles['Heading2'])
+                elements.append(heading)
+                elements.append(Spacer(1, 12))
+
+                table_data = table_block['data']
+                if 'cells' in table_data:
+                    # Create PDF table
+                    pdf_table = Table(list(iter_table_rows(table_data['cells'])))
+                    pdf_table.setStyle(TABLES_PDF_STYLE)
+                    elements.append(pdf_table)
+                    elements.append(Spacer(1, 20))
+
+            doc.build(elements)
+            buffer.seek(0)
+
+            response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+            response['Content-Disposition'] = f'attachment; filename="{document.title}_tables.pdf"'
+            return response
+
         return Response({'error': 'Invalid format'}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['get'])
@@ -483,6 +562,8 @@ class DocumentViewSet(viewsets.ModelViewSet):
         - page_type: Filter by page type
         - block_type: Filter by block type
         - language: Filter by language
+        - limit: Results per page (default 100)
+        - cursor: Page cursor from the previous response's next/previous link
         """
         query = request.query_params.get('q', '')
         document_id = request.query_params.get('document_id')
@@ -490,50 +571,80 @@ class DocumentViewSet(viewsets.ModelViewSet):
         block_type = request.query_params.get('block_type')
         language = request.query_params.get('language')
 
-        # Base queryset
-        blocks = ContentBlock.objects.select_related('page', 'page__document').all()
+        # Base queryset; only the text snippet is read from the database
+        blocks = ContentBlock.objects.annotate(snippet=Left('text_content', 500))
+        fields = [
+            'id', 'block_type', 'snippet', 'confidence',
+            'page_id', 'page__page_number', 'page__document_id', 'page__document__title',
+        ]
+        paginator = SearchResultPagination()
 
-        # Apply filters
+        # Collect the filters and apply them in one filter() call
+        conditions = Q()
         if query:
-            blocks = blocks.filter(text_content__icontains=query)
+            if connection.vendor == 'postgresql':
+                # Indexed full-text match, best matches first. ts_rank is a
+                # float4; cast it so cursor positions round-trip exactly.
+                search_query = SearchQuery(query, config='english', search_type='websearch')
+                conditions &= Q(search_vector=search_query)
+                blocks = blocks.annotate(
+                    rank=Cast(SearchRank(F('search_vector'), search_query), FloatField())
+                )
+                fields.append('rank')
+                paginator.ordering = ('-rank', '-id')
+            else:
+                conditions &= Q(text_content__icontains=query)
 
         if document_id:
-            blocks = blocks.filter(page__document_id=document_id)
+            conditions &= Q(page__document_id=document_id)
 
         if page_type:
-            blocks = blocks.filter(page__page_type=page_type)
+            conditions &= Q(page__page_type=page_type)
 
         if block_type:
-            blocks = blocks.filter(block_type=block_type)
+            conditions &= Q(block_type=block_type)
 
         if language:
-            blocks = blocks.filter(page__detected_language=language)
+            conditions &= Q(page__detected_language=language)
 
-        # Build results
-        results = []
-        for block in blocks[:100]:  # Limit to 100 results
-            results.append({
-                'document_id': block.page.document.id,
-                'document_title': block.page.document.title,
-                'page_id': block.page.id,
-                'page_number': block.page.page_number,
-                'block_id': block.id,
-                'block_type': block.block_type,
-                'text_content': block.text_content[:500],  # Limit text
-                'confidence': block.confidence,
-            })
+        blocks = blocks.filter(conditions)
 
-        serializer = SearchResultSerializer(results, many=True)
-        return Response({
-            'count': len(results),
-            'results': serializer.data
-        })
+        # Build results
+        rows = paginator.paginate_queryset(blocks.values(*fields), request, view=self)
+        results = [
+            {
+                'document_id': row['page__document_id'],
+                'document_title': row['page__document__title'],
+                'page_id': row['page_id'],
+                'page_number': row['page__page_number'],
+                'block_id': row['id'],
+                'block_type': row['block_type'],
+                'text_content': row['snippet'],
+                'confidence': row['confidence'],
+                'relevance_score': row.get('rank'),
+            }
+            for row in rows
+        ]
+        return paginator.get_paginated_response(results)
 
 
 class PageViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for pages"""
     queryset = Page.objects.all()
 
+    def get_queryset(self):
+        """Prefetch nested content for detail views"""
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            return queryset.only(*PageListSerializer.Meta.fields)
+        # One query per level instead of one per block for cells and fields
+        return queryset.prefetch_related(
+            Prefetch(
+                'content_blocks',
+                queryset=ContentBlock.objects.prefetch_related('table_cells', 'form_fields')
+            )
+        )
+
     def get_serializer_class(self):
         """Return appropriate serializer"""
         if self.action == 'list':
@@ -557,6 +668,11 @@ class ContentBlockViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         """Filter by page if provided"""
         queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.prefetch_related('table_cells', 'form_fields')
+        elif self.action == 'download_content':
+            # The export cache key and the rendered export both need the document
+            queryset = queryset.select_related('page__document')
         page_id = self.request.query_params.get('page_id')
 
         if page_id:
@@ -567,13 +683,14 @@ class ContentBlockViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=['get'], url_path='export')
     def download_content(self, request, pk=None):
         """Download individual content block in various formats"""
-        from django.http import HttpResponse
-        import json
-        import csv
-        from io import StringIO, BytesIO
-
         block = self.get_object()
         format_type = request.query_params.get('export_format', 'txt')
+
+        key = export_cache_key(block.page.document, 'block', block.id, format_type)
+        return cached_export(key, lambda: self._render_block(block, format_type))
+
+    def _render_block(self, block, format_type):
+        """Build the export of a single content block"""
         page = block.page
 
         # Generate filename base
@@ -591,36 +708,24 @@ class ContentBlockViewSet(viewsets.ReadOnlyModelViewSet):
 
                 # For tables, render as formatted table
                 if block.block_type == 'table' and block.table_data:
-                    table_data = block.table_data
-
-                    # Get headers
-                    if 'headers' in table_data and table_data['headers']:
-                        headers = [h.get('text', '') for h in table_data['headers']]
-                    else:
-                        headers = []
-
-                    # Get rows
-                    rows_data = []
-                    if 'rows' in table_data and table_data['rows']:
-                        for row in table_data['rows']:
-                            if 'cells' in row:
-                                row_cells = [cell.get('text', '') for cell in row['cells']]
-                                rows_data.append(row_cells)
+                    # Get headers and rows
+                    headers, rows = block_table_rows(block.table_data)
+                    rows_data = list(rows)
 
                     # Calculate column widths
                     if headers or rows_data:
                         num_cols = len(headers) if headers else (len(rows_data[0]) if rows_data else 0)
-                        col_widths = [15] * num_cols  # Default width
-
-                        # Adjust based on content
-                        if headers:
-                            for i, h in enumerate(headers):
-                                col_widths[i] = max(col_widths[i], len(str(h)) + 2)
 
-                        for row in rows_data:
-                            for i, cell in enumerate(row):
-                                if i < len(col_widths):
-                                    col_widths[i] = max(col_widths[i], len(str(cell)) + 2)
+                        # Widest of the default (15), the header and the column's cells
+                        columns = list(zip_longest(*rows_data, fillvalue=''))
+                        col_widths = [
+                            max(
+                                15,
+                                len(str(headers[i])) + 2 if i < len(headers) else 0,
+                                max(map(len, map(str, columns[i]))) + 2 if i < len(columns) else 0,
+                            )
+                            for i in range(num_cols)
+                        ]
 
                         # Render table
                         separator = '+' + '+'.join(['-' * w for w in col_widths]) + '+'
@@ -662,202 +767,144 @@ class ContentBlockViewSet(viewsets.ReadOnlyModelViewSet):
                     'form_data': block.form_data
                 }
 
-                response = HttpResponse(json.dumps(data, indent=2), content_type='application/json')
+                response = HttpResponse(orjson.dumps(data, option=orjson.OPT_INDENT_2), content_type='application/json')
                 response['Content-Disposition'] = f'attachment; filename="{filename_base}.json"'
                 return response
 
             if format_type == 'xlsx':
                 # Excel format for tables
-                try:
-                    from openpyxl import Workbook
-                    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-
-                    wb = Workbook()
-                    ws = wb.active
-                    ws.title = f"Page{page.page_number}_Block{block.block_number}"[:31]
-
-                    if block.block_type == 'table' and block.table_data:
-                        table_data = block.table_data
-                        current_row = 1
-
-                        # Add headers
-                        if 'headers' in table_data and table_data['headers']:
-                            for col_idx, header in enumerate(table_data['headers'], start=1):
-                                cell = ws.cell(row=current_row, column=col_idx, value=header.get('text', ''))
-                                # Style headers
-                                cell.font = Font(bold=True, color="FFFFFF")
-                                cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-                                cell.alignment = Alignment(horizontal='center', vertical='center')
-                                cell.border = Border(
-                                    left=Side(style='thin'),
-                                    right=Side(style='thin'),
-                                    top=Side(style='thin'),
-                                    bottom=Side(style='thin')
-                                )
-                            current_row += 1
-
-                        # Add rows
-                        if 'rows' in table_data and table_data['rows']:
-                            for row_data in table_data['rows']:
-                                if 'cells' in row_data:
-                                    for col_idx, cell_data in enumerate(row_data['cells'], start=1):
-                                        cell = ws.cell(row=current_row, column=col_idx, value=cell_data.get('text', ''))
-                                        cell.alignment = Alignment(horizontal='left', vertical='center')
-                                        cell.border = Border(
-                                            left=Side(style='thin'),
-                                            right=Side(style='thin'),
-                                            top=Side(style='thin'),
-                                            bottom=Side(style='thin')
-                                        )
-                                    current_row += 1
-
-                        # Auto-adjust column widths
-                        for column in ws.columns:
-                            max_length = 0
-                            column_letter = column[0].column_letter
-                            for cell in column:
-                                try:
-                                    if len(str(cell.value)) > max_length:
-                                        max_length = len(str(cell.value))
-                                except:
-                                    pass
-                            adjusted_width = min(max_length + 2, 50)
-                            ws.column_dimensions[column_letter].width = adjusted_width
-                    else:
-                        # For non-table blocks, just put text content
-                        if block.text_content:
-                            ws.cell(row=1, column=1, value=block.text_content)
-
-                    buffer = BytesIO()
-                    wb.save(buffer)
-                    buffer.seek(0)
-
-                    response = HttpResponse(buffer.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-                    response['Content-Disposition'] = f'attachment; filename="{filename_base}.xlsx"'
-                    return response
-                except ImportError:
+                if not HAS_OPENPYXL:
                     return Response({
                         'error': 'openpyxl not installed',
                         'message': 'Excel export requires openpyxl package'
                     }, status=status.HTTP_400_BAD_REQUEST)
 
-            if format_type == 'csv':
-                # CSV format
-                output = StringIO()
-                writer = csv.writer(output)
+                # Write-only mode streams rows to the file instead of keeping every cell in memory
+                wb = Workbook(write_only=True)
+                ws = wb.create_sheet(title=f"Page{page.page_number}_Block{block.block_number}"[:31])
 
                 if block.block_type == 'table' and block.table_data:
-                    table_data = block.table_data
-
-                    # Write headers
-                    if 'headers' in table_data and table_data['headers']:
-                        headers = [h.get('text', '') for h in table_data['headers']]
-                        writer.writerow(headers)
-
-                    # Write rows
-                    if 'rows' in table_data and table_data['rows']:
-                        for row_data in table_data['rows']:
-                            if 'cells' in row_data:
-                                row = [cell.get('text', '') for cell in row_data['cells']]
-                                writer.writerow(row)
+                    headers, rows = block_table_rows(block.table_data)
+                    rows = list(rows)  # Read twice: column widths, then the sheet
+
+                    # Auto-adjust column widths from the source values, one column at a
+                    # time; they must be set before any row is written
+                    columns = zip_longest(headers, *rows, fillvalue='')
+                    for col_idx, column in enumerate(columns, start=1):
+                        width = max(map(len, map(str, column)))
+                        ws.column_dimensions[get_column_letter(col_idx)].width = min(width + 2, 50)
+
+                    thin = Side(style='thin')
+                    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+
+                    # Add headers
+                    if headers:
+                        header_font = Font(bold=True, color="FFFFFF")
+                        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+                        header_alignment = Alignment(horizontal='center', vertical='center')
+                        header_row = []
+                        for value in headers:
+                            cell = WriteOnlyCell(ws, value=value)
+                            cell.font = header_font
+                            cell.fill = header_fill
+                            cell.alignment = header_alignment
+                            cell.border = border
+                            header_row.append(cell)
+                        ws.append(header_row)
+
+                    # Add rows
+                    row_alignment = Alignment(horizontal='left', vertical='center')
+                    for row in rows:
+                        row_cells = []
+                        for value in row:
+                            cell = WriteOnlyCell(ws, value=value)
+                            cell.alignment = row_alignment
+                            cell.border = border
+                            row_cells.append(cell)
+                        ws.append(row_cells)
                 else:
-                    # For non-table blocks, just write text content
+                    # For non-table blocks, just put text content
                     if block.text_content:
-                        writer.writerow([block.text_content])
+                        ws.append([block.text_content])
 
-                response = HttpResponse(output.getvalue(), content_type='text/csv')
+                response = HttpResponse(workbook_bytes(wb), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+                response['Content-Disposition'] = f'attachment; filename="{filename_base}.xlsx"'
+                return response
+
+            if format_type == 'csv':
+                # CSV format, streamed row by row
+                response = StreamingHttpResponse(iter_block_csv(block), content_type='text/csv')
                 response['Content-Disposition'] = f'attachment; filename="{filename_base}.csv"'
                 return response
 
             if format_type == 'pdf':
                 # PDF format
-                try:
-                    from reportlab.lib.pagesizes import letter
-                    from reportlab.lib import colors
-                    from reportlab.lib.styles import getSampleStyleSheet
-                    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-
-                    buffer = BytesIO()
-                    doc = SimpleDocTemplate(buffer, pagesize=letter)
-                    elements = []
-                    styles = getSampleStyleSheet()
-
-                    # Add title
-                    title = Paragraph(f"<b>{page.document.title}</b>", styles['Title'])
-                    elements.append(title)
-                    elements.append(Spacer(1, 12))
-
-                    # Add metadata
-                    meta = Paragraph(f"Page {page.page_number} - Block {block.block_number} ({block.block_type})", styles['Normal'])
-                    elements.append(meta)
-                    elements.append(Spacer(1, 12))
+                if not HAS_REPORTLAB:
+                    return Response({
+                        'error': 'reportlab not installed',
+                        'message': 'PDF export requires reportlab package'
+                    }, status=status.HTTP_400_BAD_REQUEST)
 
-                    if block.block_type == 'table' and block.table_data:
-                        # Render table
-                        table_data = block.table_data
-                        pdf_data = []
-
-                        # Add headers
-                        if 'headers' in table_data and table_data['headers']:
-                            headers = [h.get('text', '') for h in table_data['headers']]
-                            pdf_data.append(headers)
-
-                        # Add rows
-                        if 'rows' in table_data and table_data['rows']:
-                            for row_data in table_data['rows']:
-                                if 'cells' in row_data:
-                                    row = [cell.get('text', '') for cell in row_data['cells']]
-                                    pdf_data.append(row)
-
-                        # Create PDF table
-                        if pdf_data:
-                            pdf_table = Table(pdf_data)
-                            # Style the table
-                            table_style = [
-                                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
-                                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-                                ('TOPPADDING', (0, 0), (-1, 0), 10),
-                                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                            ]
+                buffer = BytesIO()
+                doc = SimpleDocTemplate(buffer, pagesize=letter)
+                elements = []
+                styles = PDF_STYLES
+
+                # Add title
+                title = Paragraph(f"<b>{page.document.title}</b>", styles['Title'])
+                elements.append(title)
+                elements.append(Spacer(1, 12))
+
+                # Add metadata
+                meta = Paragraph(f"Page {page.page_number} - Block {block.block_number} ({block.block_type})", styles['Normal'])
+                elements.append(meta)
+                elements.append(Spacer(1, 12))
 
-                            # Alternate row colors
-                            for i in range(1, len(pdf_data)):
-                                if i % 2 == 0:
-                                    table_style.append(('BACKGROUND', (0, i), (-1, i), colors.HexColor('#E7E6E6')))
-                                else:
-                                    table_style.append(('BACKGROUND', (0, i), (-1, i), colors.white))
+                if block.block_type == 'table' and block.table_data:
+                    # Render table: header row (if any) followed by the rows
+                    headers, rows = block_table_rows(block.table_data)
+                    pdf_data = ([headers] if headers else []) + list(rows)
+
+                    # Create PDF table
+                    if pdf_data:
+                        # reportlab re-measures every remaining row each time a Table
+                        # splits across pages, so long tables with a header are laid
+                        # out as several tables that each repeat it
+                        if headers and len(pdf_data) > PDF_TABLE_SPLIT_ROWS:
+                            chunks = [
+                                pdf_data[:1] + pdf_data[start:start + PDF_TABLE_CHUNK_ROWS]
+                                for start in range(1, len(pdf_data), PDF_TABLE_CHUNK_ROWS)
+                            ]
+                        else:
+                            chunks = [pdf_data]
 
-                            pdf_table.setStyle(TableStyle(table_style))
+                        for chunk in chunks:
+                            pdf_table = Table(chunk, repeatRows=1 if headers else 0)
+                            pdf_table.setStyle(BLOCK_PDF_TABLE_STYLE)
                             elements.append(pdf_table)
-                    elif block.block_type == 'form' and block.form_data:
-                        # Render form fields
-                        form_data = block.form_data
-                        if 'fields' in form_data:
-                            for field in form_data['fields']:
-                                field_text = f"<b>{field.get('field_label', field.get('field_name', 'Unknown'))}:</b> {field.get('field_value', '(empty)')}"
-                                elements.append(Paragraph(field_text, styles['Normal']))
-                                elements.append(Spacer(1, 6))
-                    else:
-                        # Plain text content
-                        text = Paragraph(block.text_content or '', styles['Normal'])
-                        elements.append(text)
+                elif block.block_type == 'form' and block.form_data:
+                    # Render form fields
+                    form_data = block.form_data
+                    if form_data.get('fields'):
+                        # One paragraph, one line per field; values are escaped since
+                        # Paragraph parses markup
+                        field_lines = [
+                            f"<b>{escape(str(field.get('field_label', field.get('field_name', 'Unknown'))))}:</b> "
+                            f"{escape(str(field.get('field_value', '(empty)')))}"
+                            for field in form_data['fields']
+                        ]
+                        elements.append(Paragraph('<br/>'.join(field_lines), styles['Normal']))
+                else:
+                    # Plain text content
+                    text = Paragraph(block.text_content or '', styles['Normal'])
+                    elements.append(text)
 
-                    doc.build(elements)
-                    buffer.seek(0)
+                doc.build(elements)
+                buffer.seek(0)
 
-                    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-                    response['Content-Disposition'] = f'attachment; filename="{filename_base}.pdf"'
-                    return response
-                except ImportError:
-                    return Response({
-                        'error': 'reportlab not installed',
-                        'message': 'PDF export requires reportlab package'
-                    }, status=status.HTTP_400_BAD_REQUEST)
+                response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+                response['Content-Disposition'] = f'attachment; filename="{filename_base}.pdf"'
+                return response
 
             # Invalid format
             return Response({
@@ -901,24 +948,30 @@ def all_documents(request):
     """All documents page"""
     # Prepare a lightweight JSON representation of all documents so the
     # template can render them immediately without relying on an API call.
-    documents_qs = Document.objects.all()
-    documents = []
-    for d in documents_qs:
-        documents.append({
-            'id': d.id,
-            'title': d.title,
-            'file_type': d.file_type,
-            'status': d.status,
-            'file_size': d.file_size,
-            'total_pages': d.total_pages,
-            'uploaded_at': d.uploaded_at.isoformat() if d.uploaded_at else None,
-        })
+    # Plain dicts, no model instances; orjson writes datetimes in ISO format.
+    documents = Document.objects.values(
+        'id', 'title', 'file_type', 'status', 'file_size', 'total_pages', 'uploaded_at'
+    )
 
     return render(request, 'documents/all_documents.html', {
-        'documents_json': json.dumps(documents)
+        'documents_json': orjson.dumps(list(documents)).decode()
     })
 
 
+async def document_status(request, document_id):
+    """Processing status for polling clients, served without tying up a worker thread"""
+    document = await Document.objects.filter(pk=document_id).values(
+        'id', 'status', 'total_pages', 'error_message', 'processing_time'
+    ).afirst()
+    if document is None:
+        return JsonResponse({'error': 'Document not found'}, status=404)
+
+    document['processed_pages'] = await Page.objects.filter(
+        document_id=document_id, processed=True
+    ).acount()
+    return JsonResponse(document)
+
+
 def document_viewer(request, document_id):
     """Document viewer page"""
     document = get_object_or_404(Document, pk=document_id)
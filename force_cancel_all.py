@@ -19,26 +19,26 @@ def force_cancel_all():
     print("="*80 + "\n")
 
     # Get all processing documents
-    processing_docs = Document.objects.filter(status='processing')
+    processing_docs = list(Document.objects.filter(status='processing').values_list('id', 'title'))
 
-    if not processing_docs.exists():
+    if not processing_docs:
         print("[OK] No documents are currently processing.\n")
         return
 
-    print(f"Found {processing_docs.count()} stuck processing documents:\n")
+    print(f"Found {len(processing_docs)} stuck processing documents:\n")
 
-    for doc in processing_docs:
-        print(f"   #{doc.id}: {doc.title}")
+    for doc_id, title in processing_docs:
+        print(f"   #{doc_id}: {title}")
 
         # Request cancellation (in case thread is still alive)
-        cancellation_manager.request_cancellation(doc.id)
+        cancellation_manager.request_cancellation(doc_id)
 
-        # Force update status
-        doc.status = 'cancelled'
-        doc.error_message = 'Force cancelled by administrator'
-        doc.save()
+    # Force update status in one statement; skip any that finished meanwhile
+    cancelled = Document.objects.filter(
+        id__in=[doc_id for doc_id, _ in processing_docs], status='processing'
+    ).update(status='cancelled', error_message='Force cancelled by administrator')
 
-        print(f"      [CANCELLED]")
+    print(f"\n   [CANCELLED] {cancelled} documents")
 
     # Clear all cancellation flags
     cancellation_manager.reset()
@@ -4,42 +4,54 @@ Script to reprocess all failed documents.
 Run this after fixing bugs to retry processing.
 """
 import os
+from concurrent.futures import ThreadPoolExecutor
+
 import django
 
 # Setup Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'docai_project.settings')
 django.setup()
 
-from documents.models import Document
-from documents.services import DocumentProcessor
+from django.conf import settings
+from django.db import connection
+
+from documents.models import Document, Page
+from documents.services import get_document_processor
+
+def reprocess_document(doc):
+    """Process one document on a worker thread"""
+    try:
+        return get_document_processor().process_document(doc)
+    finally:
+        connection.close()
 
 def reprocess_failed_documents():
     """Reprocess all documents with 'failed' status"""
-    failed_docs = Document.objects.filter(status='failed')
+    failed_docs = list(Document.objects.filter(status='failed'))
 
-    print(f"Found {failed_docs.count()} failed documents")
+    print(f"Found {len(failed_docs)} failed documents")
 
-    if failed_docs.count() == 0:
+    if not failed_docs:
         print("No failed documents to reprocess!")
         return
 
-    processor = DocumentProcessor()
-
+    # Delete existing pages and reset status, one query each for all documents
+    doc_ids = [doc.id for doc in failed_docs]
+    Page.objects.filter(document_id__in=doc_ids).delete()
+    Document.objects.filter(id__in=doc_ids).update(status='uploaded', error_message=None)
     for doc in failed_docs:
-        print(f"\n{'='*60}")
-        print(f"Reprocessing: {doc.title} (ID: {doc.id})")
-        print(f"{'='*60}")
-
-        # Delete existing pages
-        doc.pages.all().delete()
-
-        # Reset status
         doc.status = 'uploaded'
         doc.error_message = None
-        doc.save()
 
-        # Reprocess
-        success = processor.process_document(doc)
+    # Documents are independent; run DOCUMENT_WORKERS of them at a time
+    print(f"Reprocessing with {settings.DOCUMENT_WORKERS} workers...")
+    with ThreadPoolExecutor(max_workers=settings.DOCUMENT_WORKERS) as executor:
+        results = executor.map(reprocess_document, failed_docs)
+
+    for doc, success in zip(failed_docs, results):
+        print(f"\n{'='*60}")
+        print(f"Reprocessed: {doc.title} (ID: {doc.id})")
+        print(f"{'='*60}")
 
         if success:
             print(f"✓ Successfully reprocessed: {doc.title}")
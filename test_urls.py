@@ -2,7 +2,7 @@ import os
 import sys
 import django
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'document_ai_system.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'docai_project.settings')
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 try: